@@ -1,8 +1,14 @@
+import os
+import sys
 import toga
 from toga.style import Pack
 from toga.style.pack import COLUMN, ROW
-from youtube_transcript_api import YouTubeTranscriptApi
-import textwrap
+
+# The transcript helpers are shared with the desktop app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "YT2GPT 4.3"))
+from transcripts import source_from_spec
+from batch_fetch import fetch_batch
+from chunking import chunk_text
 
 class MyApp(toga.App):
     def startup(self):
@@ -26,23 +32,25 @@ class MyApp(toga.App):
         self.main_window.show()
 
     def get_transcript(self, widget):
-        video_link = self.link_input.value
-        video_id = video_link.split("=")[-1]
+        video_links = self.link_input.value.split()
         chunk_size = int(self.chunk_size_input.value)
         language = self.language_input.value
 
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        try:
-            transcript = transcript_list.find_manually_created_transcript([language])
-        except:
-            transcript = transcript_list.find_generated_transcript([language])
-        transcript_data = transcript.fetch()
-        transcript_text = " ".join([item['text'] for item in transcript_data])
+        outputs = []
+        # YT2GPT_SOURCE=replay:<dir> or synthetic:<hours> runs offline for profiling
+        source = source_from_spec(os.environ.get("YT2GPT_SOURCE"))
+        for result in fetch_batch(video_links, source=source):
+            if not result.ok:
+                outputs.append(f"{result.url}: {result.error}")
+                continue
+            track, transcript_data = result.value
+            transcript_text = " ".join([item['text'] for item in transcript_data])
 
-        sections = textwrap.wrap(transcript_text, chunk_size)
-        prompts = self.create_prompts(sections, chunk_size, language)
+            sections = chunk_text(transcript_text, chunk_size)
+            prompts = self.create_prompts(sections, chunk_size, language)
+            outputs.extend(prompts)
 
-        self.transcript_output.value = "\n\n".join(prompts)
+        self.transcript_output.value = "\n\n".join(outputs)
 
     def create_prompts(self, sections, chunk_size, language):
         prompts = []
@@ -1,50 +1,89 @@
+import os
+import re
+import sys
+from functools import partial
 from flask import Flask, render_template, request
-from youtube_transcript_api import YouTubeTranscriptApi
-import textwrap
+
+# The transcript helpers are shared with the desktop app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "YT2GPT 4.3"))
+from transcripts import load_transcript, source_from_spec
+from batch_fetch import fetch_batch
+from chunking import chunk_text
+from segments import parse_time_ranges, select_time_ranges
+from prompt_templates import PromptTemplate
 
 app = Flask(__name__)
+# Before the named placeholders, web prompts put the transcript in with "{}" (or "{0}"),
+# as prompt.format(section) did; "{{}}" was a literal "{}"
+LEGACY_CHUNK_RE = re.compile(r"\{\{\}\}|\{0?\}")
+# YT2GPT_SOURCE=replay:<dir> or synthetic:<hours> serves transcripts offline for profiling
+source = source_from_spec(os.environ.get("YT2GPT_SOURCE"))
 
 @app.route('/', methods=['GET', 'POST'])
 def transcript_app():
     if request.method == 'POST':
-        video_link = request.form.get('video_link')
-        video_id = video_link.split("=")[-1]
+        video_links = request.form.get('video_link', '').split()
+        if not video_links:
+            return "Paste at least one YouTube link."
         chunk_size = int(request.form.get('chunk_size', 0))
         language = request.form.get('language')
         prompt = request.form.get('prompt')
         end_prompt = request.form.get('end_prompt')
-
         try:
-            transcript = get_transcript(video_id)
-        except Exception as e:
+            time_ranges = parse_time_ranges(request.form.get('time_ranges', ''))
+        except ValueError as e:
             return str(e)
 
-        sections = divide_transcript(transcript, chunk_size)
-        prompts = create_prompts(sections, chunk_size, language, prompt, end_prompt)
+        results = fetch_batch(video_links, fetch=partial(get_transcript, time_ranges=time_ranges))
+        # A failing video is listed above the prompts of the others
+        errors = [f"{result.url}: {result.error}" for result in results if not result.ok]
+        if len(errors) == len(results):
+            return "<br>".join(errors)
+
+        prompts = []
+        for result in results:
+            if result.ok:
+                sections = divide_transcript(result.value, chunk_size)
+                prompts.extend(create_prompts(sections, chunk_size, language, prompt, end_prompt))
         final_text = f"Retrieve and compile bullet lists created between {1}/{len(prompts)} to {len(prompts)}/{len(prompts)}. Generate a detailed table of contents for a report using [{language}] language. The table of contents should include titles and subtitles, with bullet points under each, encompassing all the topics discussed in the previous bullet points of this conversation. Ensure that the table of contents is written in [{language}]."
 
-        return render_template('transcript.html', prompts=prompts, final_text=final_text)
+        # The form is pre-filled with the values that were just submitted
+        settings = {"chunk_size": chunk_size, "language": language, "time_ranges": request.form.get('time_ranges', '')}
+        return render_template('transcript.html', prompts=prompts, final_text=final_text, settings=settings, errors=errors)
 
     return render_template('index.html')
 
 
-def get_transcript(video_id):
-    transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-    transcript = transcript_list.find_transcript(['en'])
-    return " ".join([t['text'] for t in transcript.fetch()])
+def get_transcript(video_id, time_ranges=None):
+    track, transcript_data = load_transcript(video_id, source=source)
+    if time_ranges:
+        # Only the requested parts of the video are chunked and prompted
+        transcript_data = select_time_ranges(transcript_data, time_ranges)
+    return " ".join([t['text'] for t in transcript_data])
 
 
 def divide_transcript(transcript, chunk_size):
-    return textwrap.wrap(transcript, chunk_size)
+    return chunk_text(transcript, chunk_size)
+
+
+def legacy_template(text):
+    # "{}" and "{0}" are kept working as aliases of {chunk}
+    return PromptTemplate(LEGACY_CHUNK_RE.sub(lambda match: "{}" if match.group() == "{{}}" else "{chunk}", text or ""))
 
 
 def create_prompts(sections, chunk_size, language, prompt, end_prompt):
+    # The prompts are templates ({chunk}, {language}, {index}, {total}...) compiled once;
+    # any other braces in the user's text are kept as they are
+    prompt_template = legacy_template(prompt)
+    end_prompt_template = legacy_template(end_prompt)
     prompts = []
+    total_sections = len(sections)
     for i, section in enumerate(sections):
+        values = {"language": language, "index": i + 1, "total": total_sections, "position": f"{i+1}/{total_sections}", "chunk": section}
         prompts.append({
             "language": language,
-            "prompt": prompt.format(section),
-            "end_prompt": end_prompt.format(section)
+            "prompt": prompt_template.render(values),
+            "end_prompt": end_prompt_template.render(values)
         })
     return prompts
 
@@ -4,6 +4,7 @@ new Vue({
         video_link: '',
         chunk_size: '',
         language: '',
+        time_ranges: '',
         prompt: '',
         end_prompt: '',
         prompts: [],
@@ -15,6 +16,7 @@ new Vue({
                 video_link: this.video_link,
                 chunk_size: this.chunk_size,
                 language: this.language,
+                time_ranges: this.time_ranges,
                 prompt: this.prompt,
                 end_prompt: this.end_prompt
             })
@@ -1,65 +1,325 @@
-import json
 import os
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QLineEdit, QMessageBox, QScrollArea, QSizePolicy, QTextEdit, QComboBox, QInputDialog, QSpacerItem
+import multiprocessing
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QLabel, QLineEdit, QMessageBox, QScrollArea, QSizePolicy, QTextEdit, QComboBox, QInputDialog, QSpacerItem, QCheckBox, QFileDialog, QListView, QSplitter, QAbstractItemView
 from PyQt5.QtGui import QIcon, QPixmap
-from youtube_transcript_api import YouTubeTranscriptApi
-import textwrap
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, Qt, QAbstractListModel, QModelIndex
+from transcripts import load_transcript, source_from_spec
+from batch_fetch import fetch_batch
+import compression
+from chunking import ChunkList, WordIndex, iter_chunks, iter_token_chunks
+from datastore import MAX_RANKED_CHUNKS, Datastore, TableStore
+from dedup import DedupStats, dedupe_segments, iter_deduped
+from export import FILE_FILTERS, PromptExporter
+from json_store import read_json
+from normalization import DEFAULT_RULES, FILLER_WORDS, SOUND_TAGS, NormalizationPipeline, NormalizationReport
+from prompt_templates import LAYOUTS, build_layout
+from ranking import BM25Index
+from segments import SegmentStore, format_timestamp, parse_time_ranges, select_time_ranges
+from tokenization import load_tokenizer
 import sys
 from functools import partial
 
+# Options saved with each run in the history
+RUN_OPTIONS = ("chunk_size", "unit", "boundaries", "overlap", "language", "layout", "time_ranges", "normalize", "dedupe", "query", "top_k", "min_score", "compress_ratio")
+
+DEFAULT_TOP_K = 5  # chunks kept for a question when neither a number nor a minimum score is given
 
-class Profile:
-    def __init__(self, file_path="profiles.json"):
-        self.file_path = file_path
-        self.profiles = self.load_profiles()
 
-    def load_profiles(self):
-        if os.path.exists(self.file_path):
-            with open(self.file_path, 'r') as file:
-                return json.load(file)
-        else:
-            return {}
+class Profile:
+    def __init__(self, datastore, file_path="profiles.json"):
+        # profiles.json from earlier versions is imported into the datastore once
+        datastore.import_json("profiles", file_path)
+        # Saved behind the scenes, in one transaction, see TableStore
+        self.store = TableStore(datastore, "profiles")
+        self.profiles = self.store.data
 
     def save_profile(self, name, prompt, end_prompt):
-        self.profiles[name] = {
+        self.store.set(name, {
             "prompt": prompt,
             "end_prompt": end_prompt
-        }
-        with open(self.file_path, 'w') as file:
-            json.dump(self.profiles, file)
+        })
 
     def delete_profile(self, name):
-        self.profiles.pop(name, None)
-        with open(self.file_path, 'w') as file:
-            json.dump(self.profiles, file)
+        self.store.pop(name)
 
+    def flush(self):
+        self.store.flush()
 
-class Settings:
-    def __init__(self, file_path="settings.json"):
-        self.file_path = file_path
-        self.settings = self.load_settings()
 
-    def load_settings(self):
-        if os.path.exists(self.file_path):
-            with open(self.file_path, 'r') as file:
-                return json.load(file)
-        else:
-            return {}
+class Settings:
+    def __init__(self, datastore, file_path="settings.json"):
+        # Repeated saves (one per field on every click) are coalesced into one write
+        self.store = TableStore(datastore, "settings")
+        self.settings = self.store.data
+        self.load_file(file_path)
+
+    def load_file(self, path):
+        # settings.json stays editable by hand (most settings have no field in the window):
+        # whenever the file has changed since the last start, the keys it sets replace the
+        # saved values. The settings.json of earlier versions is imported the same way.
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return
+        if self.settings.get("settings_file_modified") == modified:
+            return
+        for key, value in read_json(path).items():
+            self.store.set(key, value)
+        self.store.set("settings_file_modified", modified)
+        self.store.flush()
 
     def save_setting(self, key, value):
-        self.settings[key] = value
-        with open(self.file_path, 'w') as file:
-            json.dump(self.settings, file)
+        self.store.set(key, value)
 
     def get_setting(self, key):
         return self.settings.get(key)
 
+    def flush(self):
+        self.store.flush()
+
+
+class PromptList:
+    # Sequence of prompts rendered on access, so holding the prompts of a long video
+    # costs no more than its chunk list (offsets into the transcript buffer)
+    def __init__(self, app, sections, language, prompt, end_prompt, store=None, layout="standard"):
+        self.app = app
+        self.sections = sections
+        self.language = language
+        self.prompt = prompt
+        self.end_prompt = end_prompt
+        self.store = store  # gives the {start_time}/{end_time} of each chunk
+        self.layout = layout
+
+    def __len__(self):
+        return len(self.sections)
+
+    def __getitem__(self, i):
+        time_range = self.store.time_range(*self.sections.span(i)) if self.store is not None else None
+        return self.app.render_prompt(i, len(self.sections), self.sections[i], self.language, self.prompt, self.end_prompt, time_range, self.layout)
+
+    def __iter__(self):
+        for i in range(len(self.sections)):
+            yield self[i]
+
+
+class OutputListModel(QAbstractListModel):
+    # Rows of the chunk list: (label, render), where render() returns the text to copy,
+    # or is None for a video header. The view only asks for the labels of visible rows,
+    # and a prompt is only rendered when it is previewed or copied.
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.DisplayRole:
+            return self.rows[index.row()][0]
+        return None
+
+    def flags(self, index):
+        if index.isValid() and self.rows[index.row()][1] is None:
+            return Qt.NoItemFlags
+        return super().flags(index)
+
+    def append(self, label, render):
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows))
+        self.rows.append((label, render))
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
+
+    def render(self, row):
+        render = self.rows[row][1]
+        return render() if render is not None else ""
+
+
+class PreparedTranscript:
+    # A transcript ready for chunking: joined, indexed, and what the cleanup stages removed
+    def __init__(self, store, words, cleanup=None, dedup_stats=None, compression=None):
+        self.store = store
+        self.words = words
+        self.cleanup = cleanup
+        self.dedup_stats = dedup_stats
+        self.compression = compression
+
+
+class RunCancelled(Exception):
+    pass
+
+
+class TranscriptWorker(QObject):
+    # Runs fetch -> chunking -> prompt building on a QThread. Only the app's
+    # non-GUI helpers (get_segments/get_prepared, divide_indexed, create_prompts...) are called from here.
+    progress = pyqtSignal(str)
+    error = pyqtSignal(str)
+    video_started = pyqtSignal(str)
+    note = pyqtSignal(str)
+    chunk_ready = pyqtSignal(str, int, int, object, str)  # video ID, index, total (0 if unknown), prompt renderer, time range
+    final_ready = pyqtSignal(str, str)  # video ID, final text
+    finished = pyqtSignal()
+
+    def __init__(self, app, video_links, options):
+        super().__init__()
+        self.app = app
+        self.video_links = video_links
+        # chunk_size, unit, boundaries, overlap, language, prompt, end_prompt,
+        # layout, concurrency, streaming, time_ranges, normalize, dedupe, query, top_k,
+        # min_score, compress_ratio
+        self.options = options
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def is_cancelled(self):
+        return self.cancelled
+
+    def run(self):
+        options = self.options
+        try:
+            self.fetched = 0
+            self.progress.emit(f"Fetching {len(self.video_links)} transcript(s)...")
+            # Picking the chunks relevant to a question, or the sentences to keep, needs the
+            # whole transcript, so neither streams
+            streaming = options["streaming"] and options["boundaries"] == "words" and not options["query"] and not options["compress_ratio"]
+            # Outside streaming mode the joined transcript and its word index are kept by the
+            # app, so clicking again with another chunk size or prompt reuses them
+            fetch = self.app.get_segments if streaming else partial(self.app.get_prepared, time_ranges=options["time_ranges"], normalize=options["normalize"], dedupe=options["dedupe"], compress_ratio=options["compress_ratio"], is_cancelled=self.is_cancelled)
+            results = fetch_batch(self.video_links, concurrency=options["concurrency"], fetch=fetch, on_result=self.on_fetched, is_cancelled=self.is_cancelled)
+            errors = [f"{result.url}: {result.error}" for result in results if not result.ok]
+            if errors and not self.cancelled:
+                self.error.emit("\n".join(errors))
+
+            for result in results:
+                if self.cancelled:
+                    break
+                if not result.ok:
+                    continue
+                if len(results) > 1:
+                    self.video_started.emit(result.video_id)
+                self.progress.emit(f"Building prompts for {result.video_id}...")
+                started_at = time.time()
+                if streaming:
+                    segments = result.value
+                    if options["time_ranges"]:
+                        # Only the requested parts of the video are chunked and prompted
+                        segments = select_time_ranges(segments, options["time_ranges"])
+                    if options["time_ranges"] and not segments:
+                        self.error.emit(f"{result.url}: no captions in the selected time range(s).")
+                        continue
+                    # Segments -> cleanup -> chunks -> prompts lazily; the transcript is never
+                    # joined. Its raw size bounds the cleaned size, enough to size the markers.
+                    transcript_size = sum(len(item['text']) + 1 for item in segments)
+                    cleanup = None
+                    if options["normalize"]:
+                        cleanup = NormalizationReport()
+                        segments = self.app.get_pipeline().iter_normalized(segments, cleanup)
+                    stats = None
+                    if options["dedupe"]:
+                        stats = DedupStats()
+                        segments = iter_deduped(segments, stats)
+                    first_budget, budget = self.app.chunk_budgets(options, transcript_size)
+                    sections = self.app.stream_sections(segments, budget, options["unit"], first_budget)
+                    renderers = self.app.iter_prompts(sections, options["language"], options["prompt"], options["end_prompt"], options["layout"])
+                    times = None
+                    total = 0  # unknown until the last chunk
+                else:
+                    prepared = result.value
+                    store, words, cleanup, stats = prepared.store, prepared.words, prepared.cleanup, prepared.dedup_stats
+                    if prepared.compression is not None:
+                        self.note.emit(prepared.compression.describe())
+                    if options["time_ranges"] and not len(store):
+                        self.error.emit(f"{result.url}: no captions in the selected time range(s).")
+                        continue
+                    first_budget, budget = self.app.chunk_budgets(options, len(store.text))
+                    if options["query"]:
+                        # Any chunk may end up first, so every chunk must fit the first prompt
+                        first_budget = budget = min(first_budget, budget)
+                    if options["boundaries"] == "words":
+                        spans = self.app.divide_indexed(words, budget, options["unit"], first_budget)
+                    else:
+                        # Sentence/pause boundaries need the caption timings, so this never streams
+                        tokenizer = self.app.get_tokenizer() if options["unit"] == "tokens" else None
+                        pause = float(self.app.settings.get_setting("pause_seconds") or 1.0)
+                        spans = words.sentence_spans(budget, store.pause_offsets(pause), options["overlap"], first_budget, tokenizer)
+                    sections = ChunkList(store.text, spans)
+                    if options["query"]:
+                        selected = self.app.select_chunks(sections, options["query"], options["top_k"], options["min_score"])
+                        if not selected:
+                            self.error.emit(f"{result.url}: no chunk matches the question.")
+                            continue
+                        self.note.emit(self.app.describe_selection(sections, selected))
+                        sections = ChunkList(store.text, [sections.span(i) for i in selected])
+                    prompts = self.app.create_prompts(sections, options["chunk_size"], options["language"], options["prompt"], options["end_prompt"], store, options["layout"])
+                    renderers = (partial(prompts.__getitem__, i) for i in range(len(prompts)))
+                    times = store
+                    total = len(prompts)
+                count = 0
+                for render in renderers:
+                    if self.cancelled:
+                        break
+                    if times is not None:
+                        start, end = times.time_range(*sections.span(count))
+                        time_range = f"{format_timestamp(start)}-{format_timestamp(end)}"
+                    else:
+                        time_range = ""
+                    self.chunk_ready.emit(result.video_id, count, total, render, time_range)
+                    count += 1
+                if options["layout"] != "standard" and count and not self.cancelled:
+                    self.note.emit(self.app.describe_layout_savings(count, options))
+                if cleanup is not None and not self.cancelled:
+                    self.note.emit(cleanup.describe())
+                if stats is not None and stats.dropped_words and not self.cancelled:
+                    self.note.emit(stats.describe(self.app.get_tokenizer() if options["unit"] == "tokens" else None))
+                if not self.cancelled:
+                    self.final_ready.emit(result.video_id, self.app.create_final_text(count, options["language"]))
+                    self.app.datastore.record_run(result.video_id, count, {key: options[key] for key in RUN_OPTIONS}, started_at)
+            self.progress.emit("Cancelled." if self.cancelled else "Done.")
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            self.finished.emit()
+
+    def on_fetched(self, result):
+        # Called from the batch pool threads; signals are thread-safe
+        self.fetched += 1
+        self.progress.emit(f"Fetched {self.fetched}/{len(set(self.video_links))} transcript(s)...")
+
 
 class TranscriptApp(QWidget):
-    def __init__(self, profile, settings):
+    def __init__(self, datastore, profile, settings, source=None):
         super().__init__()
         self.profile = profile
         self.settings = settings
+        # YT2GPT_SOURCE=replay:<dir> or synthetic:<hours> runs the app offline for profiling
+        self.source = source or source_from_spec(os.environ.get("YT2GPT_SOURCE") or self.settings.get_setting("transcript_source"))
+        self.tokenizer = None
+        self.worker = None
+        self.worker_threads = []  # kept alive until each thread has fully stopped
+        self.outputs = []  # what the chunk list copies, in order, for exporting: ("prompt", ...) or ("final", ...)
+        self.prepared = OrderedDict()  # (video ID, time ranges, cleanup options) -> PreparedTranscript, most recent last
+        self.prepared_lock = threading.Lock()
+        self.pipeline = None
+        self.process_pool = None
+        self.pool_lock = threading.Lock()  # the batch threads may all need the pipeline and pool at once
+        self.templates = {}  # (prompt, end prompt) -> compiled (first, other) prompt templates
+        # Fetched transcripts are kept in the datastore, which also serves as the cache
+        self.datastore = datastore
+        self.datastore.ttl = float(self.settings.get_setting("cache_ttl_hours") or 168) * 3600
+        self.datastore.max_entries = int(self.settings.get_setting("cache_max_entries") or 20000)
+        self.datastore.max_bytes = int(self.settings.get_setting("cache_max_mb") or 1024) * 1024 * 1024
+        max_ranked = self.settings.get_setting("search_max_ranked")
+        self.datastore.max_ranked = MAX_RANKED_CHUNKS if max_ranked is None else int(max_ranked) or None
         self.initUI()
 
     def initUI(self):
@@ -72,22 +332,67 @@ class TranscriptApp(QWidget):
         self.scrollLayout = QVBoxLayout(self.scrollAreaWidgetContents)
         self.scrollArea.setWidget(self.scrollAreaWidgetContents)
 
+        # Chunks go to a list view (only the visible rows are drawn) with a preview of the
+        # selected prompt next to it; click or Enter copies it, the arrow keys move
+        self.output_model = OutputListModel()
+        self.output_view = QListView()
+        self.output_view.setModel(self.output_model)
+        self.output_view.setUniformItemSizes(True)
+        self.output_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.output_view.clicked.connect(self.copy_row)
+        self.output_view.activated.connect(self.copy_row)
+        self.output_view.selectionModel().currentChanged.connect(self.preview_row)
+        self.preview = QTextEdit()
+        self.preview.setReadOnly(True)
+        self.preview.setPlaceholderText("Select a chunk to preview its prompt")
+        outputs = QSplitter(Qt.Horizontal)
+        outputs.addWidget(self.output_view)
+        outputs.addWidget(self.preview)
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.scrollArea)
+        splitter.addWidget(outputs)
+
         self.createForm()
-        self.layout.addWidget(self.scrollArea)
+        self.layout.addWidget(splitter)
         self.setLayout(self.layout)
 
     def createForm(self):
-        self.label_link = QLabel("Paste YouTube video link:")
+        self.label_link = QLabel("Paste YouTube video link (several links can be separated by spaces):")
         self.scrollLayout.addWidget(self.label_link)
         self.entry = QLineEdit()
         self.scrollLayout.addWidget(self.entry)
 
-        self.label_chunk_size = QLabel("Enter the number of characters per chunk (recommended: 8000 for GPT-3, 15000 for GPT-4):")
+        self.label_chunk_size = QLabel("Enter the size of each prompt, instructions included (recommended: 8000 characters for GPT-3, 15000 for GPT-4):")
         self.scrollLayout.addWidget(self.label_chunk_size)
         self.chunk_size_entry = QLineEdit()
         self.chunk_size_entry.setText(self.settings.get_setting("chunk_size"))
         self.scrollLayout.addWidget(self.chunk_size_entry)
 
+        self.label_unit = QLabel("Chunk size unit (tokens use the tokenizer_file setting if set, otherwise an estimate):")
+        self.scrollLayout.addWidget(self.label_unit)
+        self.unit_selector = QComboBox()
+        self.unit_selector.addItems(["characters", "tokens"])
+        self.unit_selector.setCurrentText(self.settings.get_setting("chunk_unit") or "characters")
+        self.scrollLayout.addWidget(self.unit_selector)
+
+        self.label_boundaries = QLabel("End chunks at:")
+        self.scrollLayout.addWidget(self.label_boundaries)
+        self.boundary_selector = QComboBox()
+        self.boundary_selector.addItems(["words", "sentences and pauses"])
+        self.boundary_selector.setCurrentText(self.settings.get_setting("chunk_boundaries") or "words")
+        self.scrollLayout.addWidget(self.boundary_selector)
+
+        self.label_overlap = QLabel("Overlap between chunks when ending at sentences (same unit as the chunk size, optional):")
+        self.scrollLayout.addWidget(self.label_overlap)
+        self.overlap_entry = QLineEdit()
+        self.overlap_entry.setText(self.settings.get_setting("overlap"))
+        self.scrollLayout.addWidget(self.overlap_entry)
+
+        self.label_time_range = QLabel("Only process these parts of the video (optional, e.g. 1:00:00-1:30:00, 2:10:00-2:20:00):")
+        self.scrollLayout.addWidget(self.label_time_range)
+        self.time_range_entry = QLineEdit()
+        self.scrollLayout.addWidget(self.time_range_entry)
+
         self.label_language = QLabel("Enter the language for translation:")
         self.scrollLayout.addWidget(self.label_language)
         self.language_entry = QLineEdit()
@@ -111,6 +416,57 @@ class TranscriptApp(QWidget):
         self.end_prompt_entry = QTextEdit()
         self.scrollLayout.addWidget(self.end_prompt_entry)
 
+        self.label_layout = QLabel("Prompt layout (compact: the instructions are only sent with the first chunk; prefix-cache: every prompt starts with the same instructions, for local servers such as llama.cpp):")
+        self.scrollLayout.addWidget(self.label_layout)
+        self.layout_selector = QComboBox()
+        self.layout_selector.addItems(LAYOUTS)
+        self.layout_selector.setCurrentText(self.settings.get_setting("prompt_layout") or "standard")
+        self.scrollLayout.addWidget(self.layout_selector)
+
+        self.label_query = QLabel("Only keep the chunks about this question (optional, the best matching chunks become the prompts):")
+        self.scrollLayout.addWidget(self.label_query)
+        self.query_entry = QLineEdit()
+        self.scrollLayout.addWidget(self.query_entry)
+
+        self.label_top_k = QLabel("Number of chunks to keep for the question (optional, default 5 unless a minimum score is set):")
+        self.scrollLayout.addWidget(self.label_top_k)
+        self.top_k_entry = QLineEdit()
+        self.top_k_entry.setText(self.settings.get_setting("top_k"))
+        self.scrollLayout.addWidget(self.top_k_entry)
+
+        self.label_min_score = QLabel("Minimum relevance score (BM25) of the chunks to keep (optional):")
+        self.scrollLayout.addWidget(self.label_min_score)
+        self.min_score_entry = QLineEdit()
+        self.min_score_entry.setText(self.settings.get_setting("min_score"))
+        self.scrollLayout.addWidget(self.min_score_entry)
+
+        self.normalize_checkbox = QCheckBox("Clean up caption noise ([Music], [Applause], HTML entities, line breaks, filler words)")
+        normalize = self.settings.get_setting("normalize")
+        self.normalize_checkbox.setChecked(True if normalize is None else bool(normalize))
+        self.scrollLayout.addWidget(self.normalize_checkbox)
+
+        self.dedupe_checkbox = QCheckBox("Remove caption text repeated from one line to the next (common in auto-generated captions)")
+        dedupe = self.settings.get_setting("dedupe")
+        self.dedupe_checkbox.setChecked(True if dedupe is None else bool(dedupe))
+        self.scrollLayout.addWidget(self.dedupe_checkbox)
+
+        self.compress_checkbox = QCheckBox("Shrink the transcript to its most informative sentences before chunking (TextRank)")
+        self.compress_checkbox.setChecked(bool(self.settings.get_setting("compress")) and compression.np is not None)
+        if compression.np is None:
+            self.compress_checkbox.setEnabled(False)
+            self.compress_checkbox.setText(self.compress_checkbox.text() + " - needs NumPy")
+        self.scrollLayout.addWidget(self.compress_checkbox)
+
+        self.label_compress_ratio = QLabel("Share of the transcript to keep when shrinking (e.g. 0.3 for 30%):")
+        self.scrollLayout.addWidget(self.label_compress_ratio)
+        self.compress_ratio_entry = QLineEdit()
+        self.compress_ratio_entry.setText(self.settings.get_setting("compress_ratio") or "0.3")
+        self.scrollLayout.addWidget(self.compress_ratio_entry)
+
+        self.streaming_checkbox = QCheckBox("Stream prompts as they are built (first chunk ready sooner, chunk totals only in the final text)")
+        self.streaming_checkbox.setChecked(bool(self.settings.get_setting("streaming")))
+        self.scrollLayout.addWidget(self.streaming_checkbox)
+
         self.save_profile_button = QPushButton("Save current prompts as a new profile")
         self.save_profile_button.clicked.connect(self.save_profile)
         self.scrollLayout.addWidget(self.save_profile_button)
@@ -123,51 +479,246 @@ class TranscriptApp(QWidget):
         self.button.clicked.connect(self.handle_click)
         self.scrollLayout.addWidget(self.button)
 
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.handle_cancel)
+        self.cancel_button.setEnabled(self.worker is not None)
+        self.scrollLayout.addWidget(self.cancel_button)
+
         self.clear_button = QPushButton("Clear")
         self.clear_button.clicked.connect(self.handle_clear)
         self.scrollLayout.addWidget(self.clear_button)
 
+        self.export_button = QPushButton("Export all prompts to a file")
+        self.export_button.clicked.connect(self.handle_export)
+        self.export_button.setEnabled(bool(self.outputs))
+        self.scrollLayout.addWidget(self.export_button)
+
+        self.label_search = QLabel('Search the transcripts fetched so far (words, or "exact phrases"):')
+        self.scrollLayout.addWidget(self.label_search)
+        self.search_entry = QLineEdit()
+        self.search_entry.returnPressed.connect(self.handle_search)
+        self.scrollLayout.addWidget(self.search_entry)
+        self.search_button = QPushButton("Search")
+        self.search_button.clicked.connect(self.handle_search)
+        self.scrollLayout.addWidget(self.search_button)
+
+        self.status_label = QLabel("")
+        self.scrollLayout.addWidget(self.status_label)
+
         spacer = QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding)
         self.scrollLayout.addItem(spacer)
 
     def handle_click(self):
-        video_link = self.entry.text()
-        # Remove playlist part of the URL if it exists
-        if "&list=" in video_link:
-            video_link = video_link.split("&list=")[0]
-        video_id = video_link.split("=")[-1]
+        # Several links can be pasted at once, separated by spaces
+        video_links = self.entry.text().split()
+        if not video_links:
+            QMessageBox.warning(self, "Error", "Please paste a YouTube video link.")
+            return
         try:
             chunk_size = int(self.chunk_size_entry.text())
             self.settings.save_setting("chunk_size", self.chunk_size_entry.text())  # save chunk size
         except ValueError:
             QMessageBox.warning(self, "Error", "Chunk size must be an integer.")
             return
-
-        language = self.language_entry.text()
-        self.settings.save_setting("language", language)  # save language
-        prompt = self.prompt_entry.toPlainText()
-        end_prompt = self.end_prompt_entry.toPlainText()
+        unit = self.unit_selector.currentText()
+        self.settings.save_setting("chunk_unit", unit)  # save chunk size unit
+        boundaries = self.boundary_selector.currentText()
+        self.settings.save_setting("chunk_boundaries", boundaries)  # save chunk boundaries
+        try:
+            overlap = int(self.overlap_entry.text() or 0)
+            self.settings.save_setting("overlap", self.overlap_entry.text())  # save overlap
+        except ValueError:
+            QMessageBox.warning(self, "Error", "Overlap must be an integer.")
+            return
 
         try:
-            transcript = self.get_transcript(video_id)
-        except Exception as e:
+            time_ranges = parse_time_ranges(self.time_range_entry.text())
+        except ValueError as e:
             QMessageBox.warning(self, "Error", str(e))
             return
 
-        sections = self.divide_transcript(transcript, chunk_size)
-        prompts = self.create_prompts(sections, chunk_size, language, prompt, end_prompt)
+        try:
+            top_k = int(self.top_k_entry.text()) if self.top_k_entry.text() else None
+            min_score = float(self.min_score_entry.text()) if self.min_score_entry.text() else None
+        except ValueError:
+            QMessageBox.warning(self, "Error", "The number of chunks must be an integer and the minimum score a number.")
+            return
+        if top_k is None and min_score is None:
+            top_k = DEFAULT_TOP_K
+        self.settings.save_setting("top_k", self.top_k_entry.text())  # save number of chunks to keep
+        self.settings.save_setting("min_score", self.min_score_entry.text())  # save minimum score
 
-        for i, prompt in enumerate(prompts):
-            button = QPushButton(f"Copy chunk {i+1}/{len(prompts)}")
-            button.clicked.connect(partial(self.copy_to_clipboard, prompt))
+        language = self.language_entry.text()
+        self.settings.save_setting("language", language)  # save language
+        layout = self.layout_selector.currentText()
+        self.settings.save_setting("prompt_layout", layout)  # save prompt layout
+        streaming = self.streaming_checkbox.isChecked()
+        self.settings.save_setting("streaming", streaming)  # save streaming mode
+        normalize = self.normalize_checkbox.isChecked()
+        self.settings.save_setting("normalize", normalize)  # save caption cleanup
+        dedupe = self.dedupe_checkbox.isChecked()
+        self.settings.save_setting("dedupe", dedupe)  # save deduplication
+        compress_ratio = None
+        if self.compress_checkbox.isChecked():
+            try:
+                compress_ratio = float(self.compress_ratio_entry.text())
+            except ValueError:
+                compress_ratio = 0
+            if not 0 < compress_ratio <= 1:
+                QMessageBox.warning(self, "Error", "The share of the transcript to keep must be a number between 0 and 1.")
+                return
+        self.settings.save_setting("compress", self.compress_checkbox.isChecked())  # save pre-compression
+        self.settings.save_setting("compress_ratio", self.compress_ratio_entry.text())  # save pre-compression ratio
+
+        options = {
+            "chunk_size": chunk_size,
+            "unit": unit,
+            "boundaries": boundaries,
+            "overlap": overlap,
+            "language": language,
+            "prompt": self.prompt_entry.toPlainText(),
+            "end_prompt": self.end_prompt_entry.toPlainText(),
+            "layout": layout,
+            "concurrency": int(self.settings.get_setting("batch_concurrency") or 8),
+            "streaming": streaming,
+            "time_ranges": time_ranges,
+            "normalize": normalize,
+            "dedupe": dedupe,
+            "query": self.query_entry.text().strip(),
+            "top_k": top_k,
+            "min_score": min_score,
+            "compress_ratio": compress_ratio,
+        }
+        self.clear_outputs()
+        self.export_button.setEnabled(False)
+        self.worker = TranscriptWorker(self, video_links, options)
+        worker_thread = QThread()
+        self.worker.moveToThread(worker_thread)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.error.connect(self.show_worker_error)
+        self.worker.video_started.connect(self.add_video_row)
+        self.worker.note.connect(self.add_note_label)
+        self.worker.chunk_ready.connect(self.add_chunk_row)
+        self.worker.final_ready.connect(self.add_final_row)
+        self.worker.finished.connect(self.worker_finished)
+        self.worker.finished.connect(worker_thread.quit)
+        worker_thread.finished.connect(partial(self.release_thread, worker_thread, self.worker))
+        worker_thread.started.connect(self.worker.run)
+        self.worker_threads.append(worker_thread)
+        self.button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        worker_thread.start()
+
+    def is_current_worker(self):
+        # Signals queued by a cancelled worker may still arrive after Clear
+        return self.worker is not None and self.sender() is self.worker
+
+    def show_progress(self, message):
+        if self.is_current_worker():
+            self.status_label.setText(message)
+
+    def show_worker_error(self, message):
+        if self.is_current_worker():
+            QMessageBox.warning(self, "Error", message)
+
+    def add_video_row(self, video_id):
+        if self.is_current_worker():
+            self.output_model.append(f"Video {video_id}:", None)
+
+    def add_note_label(self, message):
+        if self.is_current_worker():
+            self.scrollLayout.addWidget(QLabel(message))
+
+    def add_chunk_row(self, video_id, i, total, render, time_range):
+        if self.is_current_worker():
+            self.outputs.append(("prompt", video_id, i, total, render, time_range))
+            self.export_button.setEnabled(True)
+            label = f"Chunk {i+1}/{total}" if total else f"Chunk {i+1}"
+            self.output_model.append(f"{label} ({time_range})" if time_range else label, render)
+
+    def add_final_row(self, video_id, final_text):
+        if self.is_current_worker():
+            self.outputs.append(("final", video_id, final_text))
+            self.output_model.append("Final text", partial(str, final_text))
+
+    def copy_row(self, index):
+        if index.isValid() and self.output_model.rows[index.row()][1] is not None:
+            self.copy_to_clipboard(self.output_model.render(index.row()))
+            self.status_label.setText(f"Copied: {self.output_model.rows[index.row()][0]}")
+
+    def preview_row(self, current, previous):
+        self.preview.setPlainText(self.output_model.render(current.row()) if current.isValid() else "")
+
+    def clear_outputs(self):
+        self.outputs = []
+        self.output_model.clear()
+        self.preview.clear()
+
+    def worker_finished(self):
+        if self.is_current_worker():
+            self.worker = None
+            self.button.setEnabled(True)
+            self.cancel_button.setEnabled(False)
+
+    def release_thread(self, worker_thread, worker):
+        # `worker` is bound here only so a cleared/cancelled worker outlives its thread
+        worker_thread.wait()
+        self.worker_threads.remove(worker_thread)
+
+    def handle_cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.status_label.setText("Cancelling...")
+
+    def create_final_text(self, total_sections, language):
+        return f"Retrieve and compile bullet lists created between {1}/{total_sections} to {total_sections}/{total_sections}. Generate a detailed table of contents for a report using [{language}] language. The table of contents should include titles and subtitles, with bullet points under each, encompassing all the topics discussed in the previous bullet points of this conversation. Ensure that the table of contents is written in [{language}]."
+
+    def handle_export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export prompts", "prompts.jsonl", FILE_FILTERS)
+        if not path:
+            return
+        try:
+            count = self.export_outputs(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Error", f"Export failed: {e}")
+            return
+        self.status_label.setText(f"Exported {count} prompt(s) to {path}")
+
+    def export_outputs(self, path):
+        # Each prompt is rendered, written and dropped in turn; the format follows the
+        # extension (.jsonl, .md or .txt, plus .gz to compress)
+        with PromptExporter(path) as exporter:
+            for output in self.outputs:
+                if output[0] == "prompt":
+                    kind, video_id, i, total, render, time_range = output
+                    exporter.write_prompt(video_id, i, total, render(), time_range)
+                else:
+                    kind, video_id, final_text = output
+                    exporter.write_final(video_id, final_text)
+        return exporter.count
+
+    def handle_search(self):
+        query = self.search_entry.text()
+        try:
+            hits, truncated = self.datastore.search(query, int(self.settings.get_setting("search_results") or 20))
+        except (RuntimeError, sqlite3.Error) as e:
+            QMessageBox.warning(self, "Error", f"Search failed: {e}")
+            return
+        self.scrollLayout.addWidget(QLabel(f"{len(hits)} result(s) for {query}:" if hits else f"No results for {query}."))
+        if truncated:
+            self.scrollLayout.addWidget(QLabel(f"Too many matches: only the {self.datastore.max_ranked} most recently indexed passages "
+                                               f"were ranked. Add words to the search, or raise the search_max_ranked setting (0 ranks all)."))
+        for hit in hits:
+            # Copies a link that opens the video where the words are said
+            button = QPushButton(f"{hit.video_id} at {format_timestamp(hit.start)}-{format_timestamp(hit.end)}: {hit.snippet}")
+            button.clicked.connect(partial(self.copy_to_clipboard, f"https://youtu.be/{hit.video_id}?t={int(hit.start)}"))
             self.scrollLayout.addWidget(button)
-        
-        final_text = f"Retrieve and compile bullet lists created between {1}/{len(prompts)} to {len(prompts)}/{len(prompts)}. Generate a detailed table of contents for a report using [{language}] language. The table of contents should include titles and subtitles, with bullet points under each, encompassing all the topics discussed in the previous bullet points of this conversation. Ensure that the table of contents is written in [{language}]."
-        button = QPushButton(f"Copy final text")
-        button.clicked.connect(partial(self.copy_to_clipboard, final_text))
-        self.scrollLayout.addWidget(button)
 
     def handle_clear(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        self.clear_outputs()
         while self.scrollLayout.count():
             item = self.scrollLayout.takeAt(0)
             widget = item.widget()
@@ -179,42 +730,219 @@ class TranscriptApp(QWidget):
     def copy_to_clipboard(self, text):
         QApplication.clipboard().setText(text)
 
-    def get_transcript(self, video_id):
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        try:
-            # Try to get manually created transcript
-            transcript = transcript_list.find_manually_created_transcript(transcript_list._manually_created_transcripts.keys())
-        except:
-            # If manually created transcript is not available, get the first available automatically generated transcript
-            transcript = transcript_list.find_generated_transcript(transcript_list._generated_transcripts.keys())
-        transcript_data = transcript.fetch()
-        transcript_text = " ".join([item['text'] for item in transcript_data])
-        return transcript_text
-
-
-    def divide_transcript(self, transcript, chunk_size):
-        return textwrap.wrap(transcript, chunk_size)
-
-    def create_prompts(self, sections, chunk_size, language, prompt, end_prompt):
-        total_sections = len(sections)
-        prompts = []
+    def get_segments(self, video_id):
+        # Repeat runs on the same video are served from the datastore
+        track, transcript_data = load_transcript(video_id, self.datastore, self.source)
+        return transcript_data
+
+    def get_prepared(self, video_id, time_ranges=(), normalize=False, dedupe=False, compress_ratio=None, is_cancelled=None):
+        # The last few transcripts are kept joined and indexed in memory, so changing only
+        # the chunk size, language or prompts re-chunks from the index without fetching,
+        # joining or scanning the transcript again. `is_cancelled()` is checked between the
+        # stages; a cancelled run raises RunCancelled and caches nothing.
+        def check_cancelled():
+            if is_cancelled is not None and is_cancelled():
+                raise RunCancelled("Cancelled")
+
+        key = (video_id, tuple(time_ranges), normalize, dedupe, compress_ratio)
+        with self.prepared_lock:
+            if key in self.prepared:
+                self.prepared.move_to_end(key)
+                return self.prepared[key]
+        segments = self.get_segments(video_id)
+        if time_ranges:
+            segments = select_time_ranges(segments, time_ranges)
+        check_cancelled()
+        segments, cleanup = self.clean_segments(segments, normalize)
+        stats = None
+        if dedupe:
+            check_cancelled()
+            # Between fetching and chunking, so repeated caption text never reaches a prompt
+            segments, stats = dedupe_segments(segments)
+        check_cancelled()
+        store = SegmentStore.from_segments(segments)
+        words = WordIndex(store.text)
+        report = None
+        if compress_ratio:
+            check_cancelled()
+            store, report = self.compress_store(store, words, compress_ratio)
+            check_cancelled()
+            words = WordIndex(store.text)
+        prepared = PreparedTranscript(store, words, cleanup, stats, report)
+        with self.prepared_lock:
+            self.prepared[key] = prepared
+            while len(self.prepared) > 4:
+                self.prepared.popitem(last=False)
+        return prepared
+
+
+    def compress_store(self, store, words, ratio):
+        # Keeps the most informative sentences (TextRank), about `ratio` of the transcript,
+        # each as one segment with the time range it came from, so timestamps stay right
+        pause = float(self.settings.get_setting("pause_seconds") or 1.0)
+        spans, report = compression.compress_spans(store.text, words, ratio, store.pause_offsets(pause))
+        segments = []
+        for start, end in spans:
+            start_time, end_time = store.time_range(start, end)
+            segments.append({"text": store.text[start:end], "start": start_time, "duration": end_time - start_time})
+        return SegmentStore.from_segments(segments), report
+
+    def clean_segments(self, segments, normalize=True):
+        # Returns (segments, NormalizationReport or None): caption noise removed once per
+        # transcript, before anything is chunked
+        if not normalize:
+            return segments, None
+        return self.get_pipeline().normalize_segments(segments, self.get_process_pool(), os.cpu_count())
+
+    def get_pipeline(self):
+        # The rules, filler words and sound tags can be changed with the normalization_rules,
+        # filler_words and sound_tags settings
+        with self.pool_lock:
+            if self.pipeline is None:
+                self.pipeline = NormalizationPipeline(
+                    self.settings.get_setting("normalization_rules") or DEFAULT_RULES,
+                    self.settings.get_setting("filler_words") or FILLER_WORDS,
+                    self.settings.get_setting("sound_tags") or SOUND_TAGS,
+                )
+            return self.pipeline
+
+    def get_process_pool(self):
+        # Only worth it with several cores; the pipeline only uses it for large transcripts
+        with self.pool_lock:
+            if self.process_pool is None and (os.cpu_count() or 1) > 1:
+                self.process_pool = ProcessPoolExecutor()
+            return self.process_pool
+
+    def divide_indexed(self, words, chunk_size, unit="characters", first_chunk_size=None):
+        # (start, end) offsets of each chunk of words.text, found from its prebuilt WordIndex
+        if unit == "tokens":
+            return list(words.token_spans(chunk_size, self.get_tokenizer(), first_chunk_size))
+        return list(words.spans(chunk_size, first_chunk_size))
+
+    def select_chunks(self, sections, query, top_k=None, min_score=None):
+        # Ranks the chunks against the question (BM25 over an inverted index of the chunks)
+        # and returns the numbers of those to keep, in transcript order
+        return BM25Index(sections).select(query, top_k, min_score)
+
+    def describe_selection(self, sections, selected):
+        kept = sum(len(sections[i]) for i in selected)
+        total = sum(len(section) for section in sections)
+        numbers = ", ".join(str(i + 1) for i in selected)
+        return f"Kept {len(selected)} of {len(sections)} chunks for the question (chunks {numbers}, {100 * kept / total:.0f}% of the transcript)."
+
+    def stream_sections(self, segments, chunk_size, unit="characters", first_chunk_size=None):
+        pieces = (item['text'] for item in segments)
+        if unit == "tokens":
+            return iter_token_chunks(pieces, chunk_size, self.get_tokenizer(), first_chunk_size)
+        return iter_chunks(pieces, chunk_size, first_chunk_size)
+
+    def chunk_budgets(self, options, transcript_size):
+        # A character count also bounds the token count closely enough for sizing the markers
+        measure = self.get_tokenizer().count if options["unit"] == "tokens" else len
+        return self.plan_chunk_budgets(options["chunk_size"], transcript_size, options["language"], options["prompt"], options["end_prompt"], measure, options["layout"])
+
+    def get_tokenizer(self):
+        # Loaded on first use: a BPE tokenizer if a local vocabulary is configured (exact
+        # for the tiktoken encodings it knows the split pattern of), otherwise an estimate
+        if self.tokenizer is None:
+            self.tokenizer = load_tokenizer(self.settings.get_setting("tokenizer_file"))
+        return self.tokenizer
+
+    def create_prompts(self, sections, chunk_size, language, prompt, end_prompt, store=None, layout="standard"):
+        return PromptList(self, sections, language, prompt, end_prompt, store, layout)
+
+    def iter_prompts(self, sections, language, prompt, end_prompt, layout="standard"):
+        # Streaming variant of create_prompts, yielding one renderer per chunk as soon as
+        # the chunk exists. The number of chunks is not known yet, so the markers only
+        # carry the chunk number.
         for i, section in enumerate(sections):
-            if prompt:
-                start_prompt = f"{prompt}. Write in [{language}]."
-            else:
-                if i == 0:
-                    start_prompt = f"From now, you will write in [{language}]. I will provide you with a transcription of spoken content, and I need your help to understand what was said. Please listen carefully and provide a concise bullet-point summary of the main ideas and key points covered in the given text. Include the essential concepts, arguments, or findings, and emphasize any important details or supporting evidence. Make sure to mention the topics discussed in the text and organize your response in a clear and coherent bullet list format. Your summary should condense the information while maintaining accuracy and provide a comprehensive overview of the text's content. Separatly, you will note all the stastictics and formulas."
-                else:
-                    start_prompt = f"Continue to listen and provide a concise bullet-point summary in [{language}]. Note all the stastictics and formulas separately."
-
-            end_prompt_text = f"{end_prompt}. Write in [{language}]." if end_prompt else f"Remember to summarize key ideas in bullet points. Note statistics and formulas separately in [{language}]."
-
-            start_marker = f"{start_prompt} >[START CHUNK {i+1}/{total_sections}]"
-            end_marker = f"[END CHUNK {i+1}/{total_sections}]< {end_prompt_text}"
-
-            prompts.append(f"{start_marker}\n{section}\n{end_marker}")
-
-        return prompts
+            yield partial(self.render_prompt, i, None, section, language, prompt, end_prompt, None, layout)
+
+    def render_prompt(self, i, total_sections, section, language, prompt, end_prompt, time_range=None, layout="standard"):
+        first, following = self.prompt_templates(prompt, end_prompt, layout)
+        start_time, end_time = (format_timestamp(time) for time in time_range) if time_range is not None else ("", "")
+        return (first if i == 0 else following).render({
+            "language": language,
+            "index": i + 1,
+            "total": total_sections if total_sections is not None else "",
+            "position": f"{i+1}/{total_sections}" if total_sections is not None else f"{i+1}",
+            "chunk": section,
+            "start_time": start_time,
+            "end_time": end_time,
+        })
+
+    def prompt_templates(self, prompt, end_prompt, layout="standard"):
+        # (first chunk, other chunks) templates, compiled once per prompt text and layout
+        key = (prompt, end_prompt, layout)
+        templates = self.templates.get(key)
+        if templates is None:
+            templates = build_layout(prompt, end_prompt, layout)
+            if len(self.templates) >= 64:
+                self.templates.clear()
+            self.templates[key] = templates
+        return templates
+
+    def plan_chunk_budgets(self, chunk_size, transcript_size, language, prompt, end_prompt, measure=len, layout="standard"):
+        # Returns (first_budget, budget): how much transcript the first and the other chunks
+        # may hold so that the *rendered* prompt, instructions and markers included, stays
+        # within chunk_size. Only the fixed prompt parts are measured, once; the "i/n"
+        # markers are sized for the largest chunk count this transcript could produce.
+        digits = 1
+        while True:
+            first_overhead, overhead = self.prompt_overheads(digits, language, prompt, end_prompt, measure, layout)
+            first_budget = chunk_size - first_overhead
+            budget = chunk_size - overhead
+            if first_budget < 1 or budget < 1:
+                overhead = chunk_size - min(first_budget, budget)
+                raise ValueError(f"Chunk size is too small: the prompt text alone takes {overhead} of the {chunk_size} available.")
+            most_chunks = 1 + -(-max(0, transcript_size - first_budget) // budget)
+            if len(str(most_chunks)) <= digits:
+                return first_budget, budget
+            digits += 1
+
+    def prompt_overheads(self, digits, language, prompt, end_prompt, measure=len, layout="standard"):
+        # Size of the first and of the other prompts without their chunk, with "i/n"
+        # markers of `digits` digits
+        first, following = self.prompt_templates(prompt, end_prompt, layout)
+        values = {
+            "language": language,
+            "index": "9" * digits,
+            "total": "9" * digits,
+            "position": "9" * digits + "/" + "9" * digits,
+            "chunk": "",
+            "start_time": "99:59:59",
+            "end_time": "99:59:59",
+        }
+        return measure(first.render(values)), measure(following.render(values))
+
+    def describe_layout_savings(self, count, options):
+        # What the instructions of `count` prompts cost in this layout, against the standard one
+        # (or, for prefix-cache, how much of them a prompt-caching server can reuse). Always in
+        # tokens (estimated unless tokenizer_file is set), and in characters too when the
+        # chunks are sized in characters.
+        measures = [("tokens", self.get_tokenizer().count)]
+        if options["unit"] != "tokens":
+            measures.append(("characters", len))
+        digits = len(str(count))
+        if options["layout"] == "prefix-cache":
+            # The part of the prompts that a server caching prompt prefixes evaluates only once
+            prompts = [self.render_prompt(i, count, "", options["language"], options["prompt"], options["end_prompt"], None, "prefix-cache") for i in (0, 1)]
+            prefix = os.path.commonprefix(prompts)
+            shared = [(unit, measure(prefix)) for unit, measure in measures]
+            size = " / ".join(f"{value} {unit}" for unit, value in shared)
+            saved = " / ".join(f"{(count - 1) * value} {unit}" for unit, value in shared)
+            return f"Prefix-cache layout: the first {size} of every prompt are identical, so a server with prompt caching evaluates them once instead of {count} times ({saved} not re-evaluated)."
+        costs = []
+        for unit, measure in measures:
+            totals = []
+            for layout in ("standard", options["layout"]):
+                first_overhead, overhead = self.prompt_overheads(digits, options["language"], options["prompt"], options["end_prompt"], measure, layout)
+                totals.append(first_overhead + (count - 1) * overhead)
+            costs.append((unit, totals))
+        taken = " / ".join(f"{totals[1]} {unit}" for unit, totals in costs)
+        before = " / ".join(f"{totals[0]}" for unit, totals in costs)
+        saved = " / ".join(f"{totals[0] - totals[1]} {unit}" for unit, totals in costs)
+        return f"{options['layout'].capitalize()} layout: the instructions take {taken} over {count} prompts instead of {before} ({saved} saved compared with the standard layout)."
 
     def save_profile(self):
         text, ok = QInputDialog.getText(self, 'Save profile', 'Enter a name for the profile:')
@@ -233,6 +961,23 @@ class TranscriptApp(QWidget):
         if profile:
             self.prompt_entry.setPlainText(profile["prompt"])
             self.end_prompt_entry.setPlainText(profile["end_prompt"])
+            # Compiled now, so every chunk of the next run only renders
+            self.prompt_templates(profile["prompt"], profile["end_prompt"])
+
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.cancel()
+        for worker_thread in list(self.worker_threads):
+            # The worker's finished -> quit signal is queued to this (blocked) thread, so the
+            # thread is told to stop here; its event loop ends once the cancelled run returns
+            worker_thread.quit()
+            worker_thread.wait()
+        with self.pool_lock:
+            if self.process_pool is not None:
+                self.process_pool.shutdown()
+        self.settings.flush()
+        self.profile.flush()
+        super().closeEvent(event)
 
     def refresh_profile_selector(self):
         self.profile_selector.clear()
@@ -241,10 +986,12 @@ class TranscriptApp(QWidget):
             self.load_profile()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # the caption cleanup pool also works in the bundled executable
     app = QApplication(sys.argv)
-    app.setWindowIcon(QIcon(os.path.join(sys._MEIPASS, 'logo.png')))  # Set window icon
-    profile = Profile()
-    settings = Settings()
-    ex = TranscriptApp(profile, settings)
+    app.setWindowIcon(QIcon(os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__))), 'logo.png')))  # Set window icon
+    datastore = Datastore()
+    profile = Profile(datastore)
+    settings = Settings(datastore)
+    ex = TranscriptApp(datastore, profile, settings)
     ex.show()
     sys.exit(app.exec_())
@@ -0,0 +1,59 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from transcripts import extract_video_id, load_transcript
+
+
+class BatchResult:
+    def __init__(self, url, video_id, value=None, error=None):
+        self.url = url
+        self.video_id = video_id
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+CANCEL_POLL_SECONDS = 0.1  # how often a running batch checks whether it was cancelled
+
+
+def fetch_batch(video_links, concurrency=8, cache=None, fetch=None, on_result=None, source=None, is_cancelled=None):
+    # Fetches every link on a bounded thread pool and returns one BatchResult per link,
+    # in input order. A failing video never aborts the rest of the batch.
+    # `fetch` maps a video ID to a value (default: (track, segments) from `source` through the cache);
+    # `on_result` is called with each result as soon as it is ready.
+    # Once `is_cancelled()` returns true, the links not fetched yet are skipped and the
+    # batch returns without waiting for the fetches in progress; both get a "Cancelled" error.
+    if fetch is None:
+        fetch = partial(load_transcript, cache=cache, source=source)
+    video_ids = [extract_video_id(link) for link in video_links]
+    # The same video pasted twice is only fetched once
+    unique_ids = list(dict.fromkeys(video_ids))
+    outcomes = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(unique_ids) or 1)))
+    futures = {executor.submit(fetch, video_id): video_id for video_id in unique_ids}
+    pending = set(futures)
+    try:
+        while pending:
+            if is_cancelled is not None and is_cancelled():
+                break
+            done, pending = wait(pending, timeout=CANCEL_POLL_SECONDS if is_cancelled is not None else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                video_id = futures[future]
+                try:
+                    outcomes[video_id] = (future.result(), None)
+                except Exception as e:
+                    outcomes[video_id] = (None, str(e) or e.__class__.__name__)
+                if on_result is not None:
+                    value, error = outcomes[video_id]
+                    on_result(BatchResult(video_links[video_ids.index(video_id)], video_id, value, error))
+    finally:
+        # Only waits when everything is done; after a cancel, the fetches not started are
+        # dropped and those still running finish in the background, their results unused
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=not pending)
+    for future in pending:
+        outcomes[futures[future]] = (None, "Cancelled")
+    return [BatchResult(link, video_id, *outcomes[video_id]) for link, video_id in zip(video_links, video_ids)]
@@ -0,0 +1,34 @@
+# Throughput of fetch_batch against a local stub transcript server.
+# Usage: python benchmarks/bench_batch.py [videos] [latency_seconds]
+import json
+import os
+import sys
+import time
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from batch_fetch import fetch_batch
+from stub_server import StubTranscriptServer
+
+
+def main():
+    videos = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    links = [f"https://www.youtube.com/watch?v=vid{i:08d}" for i in range(videos)]
+
+    with StubTranscriptServer(latency=latency) as server:
+        def fetch(video_id):
+            with urlopen(f"{server.url}/transcript/{video_id}") as response:
+                return json.load(response)
+
+        print(f"{videos} videos, {latency * 1000:.0f} ms simulated latency per request")
+        for concurrency in (1, 4, 8, 16, 32):
+            started = time.perf_counter()
+            results = fetch_batch(links, concurrency=concurrency, fetch=fetch)
+            elapsed = time.perf_counter() - started
+            failed = sum(1 for result in results if not result.ok)
+            print(f"concurrency {concurrency:>2}: {elapsed:6.2f} s, {videos / elapsed:7.1f} videos/s, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
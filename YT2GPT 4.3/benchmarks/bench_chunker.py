@@ -0,0 +1,43 @@
+# Compares chunk_text with the textwrap.wrap path it replaced, on synthetic transcripts.
+# Usage: python benchmarks/bench_chunker.py [chunk_size]
+import os
+import sys
+import textwrap
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from chunking import chunk_text
+from transcripts import SyntheticSource
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # A second untraced run gives the timing without tracemalloc overhead
+    started = time.perf_counter()
+    function(*args)
+    return result, min(elapsed, time.perf_counter() - started), peak
+
+
+def main():
+    chunk_size = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    for hours in (1, 10, 50):
+        track, segments = SyntheticSource(hours=hours).fetch("benchmark")
+        transcript = " ".join(item['text'] for item in segments)
+        del segments
+        wrapped, wrap_time, wrap_peak = measure(textwrap.wrap, transcript, chunk_size)
+        chunks, chunk_time, chunk_peak = measure(chunk_text, transcript, chunk_size)
+        same = chunks == textwrap.wrap(transcript, chunk_size, break_on_hyphens=False)
+        print(f"{hours:>2}h ({len(transcript) / 1e6:5.1f}M chars, {len(chunks)} chunks): "
+              f"textwrap {wrap_time * 1000:8.1f} ms / {wrap_peak / 1e6:6.1f} MB peak, "
+              f"chunk_text {chunk_time * 1000:7.1f} ms / {chunk_peak / 1e6:6.1f} MB peak, "
+              f"{wrap_time / chunk_time:5.0f}x faster, identical chunks: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Sends the prompts of a synthetic transcript, in each prompt layout, to a local stand-in
+# for a llama.cpp server with prompt caching, and measures how much of each prompt the
+# server could reuse from the previous one instead of evaluating it again.
+# Usage: python benchmarks/bench_prefix_cache.py [hours] [chunk_size]
+import json
+import os
+import sys
+import time
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from chunking import chunk_text
+from prompt_templates import LAYOUTS, build_layout
+from stub_server import StubCompletionServer
+from transcripts import SyntheticSource
+
+
+def render_prompts(transcript, chunk_size, layout, language="English"):
+    first, following = build_layout("", "", layout)
+    # The chunks are sized so that every rendered prompt fits in chunk_size, as in the app
+    empty = {"language": language, "position": "999/999", "chunk": ""}
+    first_budget = chunk_size - len(first.render(empty))
+    budget = chunk_size - len(following.render(empty))
+    chunks = chunk_text(transcript, budget, first_budget)
+    total = len(chunks)
+    return [(first if i == 0 else following).render({
+        "language": language,
+        "index": i + 1,
+        "total": total,
+        "position": f"{i+1}/{total}",
+        "chunk": chunk,
+    }) for i, chunk in enumerate(chunks)]
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+    track, segments = SyntheticSource(hours=hours).fetch("benchmark")
+    transcript = " ".join(item['text'] for item in segments)
+    print(f"{hours:g}h transcript, {len(transcript) / 1e6:.2f}M chars, chunk size {chunk_size}")
+    with StubCompletionServer() as server:
+        for layout in LAYOUTS:
+            prompts = render_prompts(transcript, chunk_size, layout)
+            total = evaluated = 0
+            started = time.perf_counter()
+            for prompt in prompts:
+                request = Request(f"{server.url}/completion", data=json.dumps({"prompt": prompt, "cache_prompt": True}).encode("utf-8"),
+                                  headers={"Content-Type": "application/json"})
+                with urlopen(request) as response:
+                    answer = json.load(response)
+                total += answer["tokens_evaluated"]
+                evaluated += answer["timings"]["prompt_n"]
+            elapsed = time.perf_counter() - started
+            print(f"{layout:<13} {len(prompts):>4} prompts, {total:>8} tokens sent, {evaluated:>8} evaluated, "
+                  f"{100 * (total - evaluated) / total:5.1f}% reused from the cache, {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
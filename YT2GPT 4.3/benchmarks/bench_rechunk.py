@@ -0,0 +1,53 @@
+# Measures re-chunking an already indexed transcript at a new chunk size (what a click
+# with only the chunk size or prompts changed costs), against chunking it from scratch.
+# Usage: python benchmarks/bench_rechunk.py [chunk_size]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from chunking import WordIndex, iter_sentence_spans, iter_spans, iter_token_spans
+from segments import SegmentStore
+from tokenization import HeuristicTokenizer
+from transcripts import SyntheticSource
+
+
+def best_time(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    chunk_size = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    tokenizer = HeuristicTokenizer()
+    for hours in (1, 10, 50):
+        track, segments = SyntheticSource(hours=hours).fetch("benchmark")
+        store = SegmentStore.from_segments(segments)
+        del segments
+        text = store.text
+        pauses = store.pause_offsets()
+        started = time.perf_counter()
+        words = WordIndex(text)
+        words.cumulative_tokens(tokenizer)
+        words.boundary_words(pauses)
+        index_time = time.perf_counter() - started
+        cases = (
+            ("characters", lambda: list(iter_spans(text, chunk_size)), lambda: list(words.spans(chunk_size))),
+            ("tokens", lambda: list(iter_token_spans(text, chunk_size // 4, tokenizer)), lambda: list(words.token_spans(chunk_size // 4, tokenizer))),
+            ("sentences", lambda: list(iter_sentence_spans(text, chunk_size, pauses, 200)), lambda: list(words.sentence_spans(chunk_size, pauses, 200))),
+        )
+        print(f"{hours:>2}h ({len(text) / 1e6:5.1f}M chars, {len(words)} words), index built once in {index_time * 1000:.0f} ms:")
+        for name, scratch, indexed in cases:
+            expected, scratch_time = best_time(scratch, repeat=2)
+            spans, indexed_time = best_time(indexed)
+            print(f"    {name:<10} from scratch {scratch_time * 1000:8.1f} ms, from the index {indexed_time * 1000:6.2f} ms "
+                  f"({len(spans)} chunks, identical: {spans == expected})")
+
+
+if __name__ == "__main__":
+    main()
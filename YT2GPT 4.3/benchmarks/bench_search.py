@@ -0,0 +1,54 @@
+# Fills a datastore with synthetic one-hour transcripts and measures full-text queries
+# on it: a rare word, a less rare word, a phrase and two words that are everywhere (the
+# worst case, since every chunk has to be ranked).
+# Usage: python benchmarks/bench_search.py [hours] [database]
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from datastore import Datastore
+from transcripts import SyntheticSource
+
+
+def add_rare_words(segments, rng, share=0.02):
+    # The synthetic vocabulary is tiny; real transcripts also have names, numbers and
+    # jargon that only appear in a few videos. Word n of that long tail is about n times
+    # rarer than the first one.
+    for item in segments:
+        words = item['text'].split()
+        for i in range(len(words)):
+            if rng.random() < share:
+                words[i] = f"term{int(rng.paretovariate(1.0)) % 100000}"
+        item['text'] = " ".join(words)
+    return segments
+
+
+def main():
+    hours = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.mkdtemp(), "bench.db")
+    datastore = Datastore(path)
+    existing = datastore.query("SELECT COUNT(*) FROM transcripts")[0][0]
+    source = SyntheticSource(hours=1.0)
+    rng = random.Random(0)
+    started = time.perf_counter()
+    for video in range(existing, hours):
+        track, segments = source.fetch(f"video{video:06d}")
+        datastore.store(f"video{video:06d}", track, add_rare_words(segments, rng))
+    if hours > existing:
+        print(f"Indexed {hours - existing} hour(s) in {time.perf_counter() - started:.1f} s")
+    print(f"{datastore.query('SELECT COUNT(*) FROM passages')[0][0]} indexed chunks, {os.path.getsize(path) / 1e6:.0f} MB ({path})")
+    for query in ("term9999", "term99", '"heat flow"', "energy model"):
+        datastore.search(query)
+        repeat = 5
+        started = time.perf_counter()
+        for _ in range(repeat):
+            hits, truncated = datastore.search(query)
+        elapsed = (time.perf_counter() - started) / repeat
+        print(f"{query:<14} {len(hits):>3} hits, {elapsed * 1000:8.2f} ms{' (truncated)' if truncated else ''}")
+
+
+if __name__ == "__main__":
+    main()
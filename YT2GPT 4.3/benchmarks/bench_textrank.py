@@ -0,0 +1,30 @@
+# Measures the TextRank pre-compression on synthetic transcripts of growing length,
+# up to about 100k sentences.
+# Usage: python benchmarks/bench_textrank.py [ratio]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from chunking import WordIndex
+from compression import compress_spans
+from segments import SegmentStore
+from transcripts import SyntheticSource
+
+
+def main():
+    ratio = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+    for hours in (1, 10, 50, 150, 230):
+        track, segments = SyntheticSource(hours=hours).fetch("benchmark")
+        store = SegmentStore.from_segments(segments)
+        words = WordIndex(store.text)
+        pauses = store.pause_offsets(1.0)
+        started = time.perf_counter()
+        spans, report = compress_spans(store.text, words, ratio, pauses)
+        elapsed = time.perf_counter() - started
+        print(f"{hours:>4}h {report.sentences:>7} sentences -> {report.kept_sentences:>6} kept "
+              f"({100 * report.kept_chars / report.original_chars:.0f}% of {report.original_chars / 1e6:.1f}M chars) in {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
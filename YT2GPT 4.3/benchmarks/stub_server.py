@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from tokenization import PRETOKENIZE_RE
+
+
+def make_segments(video_id, count=400):
+    return [{"text": f"{video_id} caption line {i} with a few more words", "start": i * 2.5, "duration": 2.5} for i in range(count)]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 makes high-concurrency runs measure SYN retries
+    request_queue_size = 256
+
+
+class StubTranscriptServer:
+    # Local stand-in for the YouTube transcript endpoints: GET /transcript/<video_id>
+    # answers with a JSON segment list after a fixed artificial latency.
+    def __init__(self, latency=0.05, segments_per_video=400):
+        self.latency = latency
+        self.segments_per_video = segments_per_video
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                video_id = self.path.rsplit("/", 1)[-1]
+                time.sleep(server.latency)
+                body = json.dumps(make_segments(video_id, server.segments_per_video)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = _Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StubCompletionServer:
+    # Local stand-in for a llama.cpp server: POST /completion with {"prompt", "cache_prompt"}.
+    # Like llama.cpp, a single slot keeps the tokens of the last prompt and, with
+    # cache_prompt, only evaluates what follows the longest prefix shared with them.
+    # Prompt evaluation costs `ms_per_token` per evaluated token (pre-tokenisation
+    # pieces stand in for tokens). Answers with llama.cpp's tokens_evaluated,
+    # tokens_cached and timings.prompt_n / prompt_ms fields.
+    def __init__(self, ms_per_token=0.05):
+        self.ms_per_token = ms_per_token
+        self.cached = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                body = json.dumps(server.complete(request["prompt"], request.get("cache_prompt", False))).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = _Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def complete(self, prompt, cache_prompt):
+        tokens = PRETOKENIZE_RE.findall(prompt)
+        with self.lock:
+            reused = 0
+            if cache_prompt:
+                limit = min(len(tokens), len(self.cached))
+                while reused < limit and tokens[reused] == self.cached[reused]:
+                    reused += 1
+            evaluated = len(tokens) - reused
+            time.sleep(evaluated * self.ms_per_token / 1000)
+            self.cached = tokens
+        return {
+            "content": "",
+            "tokens_evaluated": len(tokens),
+            "tokens_cached": reused,
+            "timings": {"prompt_n": evaluated, "prompt_ms": evaluated * self.ms_per_token},
+        }
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,341 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+WHITESPACE = "\t\n\x0b\x0c\r "
+_TO_SPACE = str.maketrans(WHITESPACE, " " * len(WHITESPACE))
+WORD_RE = re.compile(r"[^\t\n\x0b\x0c\r ]+")
+SENTENCE_END = ".!?\u2026"
+CLOSING = "\"')]\u201d\u2019"
+
+
+def normalize_whitespace(text):
+    # Every whitespace character becomes one space (runs are kept, not collapsed). Unlike
+    # textwrap, tabs are not expanded to the next multiple of 8 columns first.
+    return text.translate(_TO_SPACE)
+
+
+def skip_spaces(text, pos):
+    end = len(text)
+    while pos < end and text[pos] == " ":
+        pos += 1
+    return pos
+
+
+def next_cut(text, pos, width):
+    # Finds the chunk starting at `pos` (a non-space character of whitespace-normalised text).
+    # Returns (end, next_pos): the chunk is text[pos:end], the next chunk starts at next_pos.
+    # Mirrors textwrap.wrap(text, width, break_on_hyphens=False): greedy packing of words,
+    # whitespace dropped at chunk edges, words longer than `width` split to fill the chunk.
+    length = len(text)
+    limit = pos + width
+    if limit >= length:
+        return len(text.rstrip(" ")), length
+    if text[limit] == " ":
+        end = limit
+        while text[end - 1] == " ":
+            end -= 1
+        return end, skip_spaces(text, limit)
+    space = text.rfind(" ", pos, limit)
+    if space == -1:
+        # A single word longer than the chunk
+        return limit, limit
+    word_end = text.find(" ", space + 1)
+    if word_end == -1:
+        word_end = length
+    if word_end - space - 1 > width:
+        # The next word can never fit on its own, so it is split to fill this chunk
+        return limit, limit
+    end = space
+    while text[end - 1] == " ":
+        end -= 1
+    return end, skip_spaces(text, space)
+
+
+class ChunkList:
+    # Chunks as (start, end) views into one shared text buffer. Only the offsets are
+    # stored (16 bytes per chunk); a chunk's text is sliced out when it is accessed.
+    def __init__(self, text, spans=()):
+        self.text = text
+        self.starts = array('q')
+        self.ends = array('q')
+        for start, end in spans:
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def __iter__(self):
+        for index in range(len(self.starts)):
+            yield self[index]
+
+    def span(self, index):
+        return self.starts[index], self.ends[index]
+
+
+def check_widths(width, first_width):
+    if width < 1 or (first_width is not None and first_width < 1):
+        raise ValueError("Chunk size must be at least 1.")
+    return width if first_width is None else first_width
+
+
+def iter_spans(text, width, first_width=None):
+    # Single pass over whitespace-normalised text, yielding (start, end) of every chunk.
+    # `first_width`, if given, applies to the first chunk only.
+    current_width = check_widths(width, first_width)
+    pos = skip_spaces(text, 0)
+    length = len(text)
+    while pos < length:
+        end, next_pos = next_cut(text, pos, current_width)
+        yield pos, end
+        pos = next_pos
+        current_width = width
+
+
+def chunk_text(text, width, first_width=None):
+    # Drop-in replacement for textwrap.wrap(text, width): same word-boundary chunks
+    # (except that hyphenated words are never split, tabs count as one space and leading
+    # whitespace is dropped from the first chunk too), but one linear scan with one
+    # slice per chunk instead of tokenising the whole transcript.
+    check_widths(width, first_width)
+    text = normalize_whitespace(text)
+    return [text[start:end] for start, end in iter_spans(text, width, first_width)]
+
+
+def iter_chunks(pieces, width, first_width=None):
+    # Lazily chunks the text " ".join(pieces) without ever building it. Only a window of
+    # a few chunks is held in memory, so the first chunk is ready as soon as enough
+    # pieces have arrived. Yields the same chunks as chunking the joined text at once.
+    current_width = check_widths(width, first_width)
+    widest = max(width, current_width)
+    lookahead = 2 * widest + 1  # next_cut never looks further than this past `pos`
+    buffer = ""
+    pending = []
+    pending_length = 0
+    first = True
+    for piece in pieces:
+        if not first:
+            pending.append(" ")
+            pending_length += 1
+        first = False
+        pending.append(piece)
+        pending_length += len(piece)
+        if len(buffer) + pending_length <= lookahead + widest:
+            continue
+        buffer = normalize_whitespace(buffer + "".join(pending))
+        pending = []
+        pending_length = 0
+        pos = skip_spaces(buffer, 0)
+        while len(buffer) - pos > lookahead:
+            end, next_pos = next_cut(buffer, pos, current_width)
+            yield buffer[pos:end]
+            pos = next_pos
+            current_width = width
+        buffer = buffer[pos:]
+
+    buffer = normalize_whitespace(buffer + "".join(pending))
+    pos = skip_spaces(buffer, 0)
+    while pos < len(buffer):
+        end, next_pos = next_cut(buffer, pos, current_width)
+        yield buffer[pos:end]
+        pos = next_pos
+        current_width = width
+
+
+def iter_token_spans(text, budget, tokenizer, first_budget=None):
+    # Packs whole words into chunks of at most `budget` tokens. Each distinct word is
+    # counted once and the running total is kept, so candidate chunks are never re-tokenised.
+    check_widths(budget, first_budget)
+    words = (((match.start(), match.end()), match.group()) for match in WORD_RE.finditer(text))
+    for chunk in _pack_words(words, budget, tokenizer, first_budget):
+        yield chunk[0][0], chunk[-1][1]
+
+
+def chunk_text_by_tokens(text, budget, tokenizer, first_budget=None):
+    return [text[start:end] for start, end in iter_token_spans(text, budget, tokenizer, first_budget)]
+
+
+def iter_token_chunks(pieces, budget, tokenizer, first_budget=None):
+    # Streaming variant of chunk_text_by_tokens over the pieces of " ".join(pieces);
+    # words inside a chunk are joined with single spaces.
+    check_widths(budget, first_budget)
+    words = ((word, word) for piece in pieces for word in piece.split())
+    for chunk in _pack_words(words, budget, tokenizer, first_budget):
+        yield " ".join(chunk)
+
+
+def _pack_words(words, budget, tokenizer, first_budget=None):
+    # `words` yields (payload, word); yields the payloads of each chunk as a list
+    counts = {}
+    chunk = []
+    used = 0
+    current_budget = budget if first_budget is None else first_budget
+    for payload, word in words:
+        tokens = counts.get(word)
+        if tokens is None:
+            # Counted with the leading space it has everywhere but at a chunk start
+            tokens = counts[word] = tokenizer.count(" " + word)
+        if chunk and used + tokens > current_budget:
+            yield chunk
+            chunk = []
+            used = 0
+            current_budget = budget
+        chunk.append(payload)
+        used += tokens
+    if chunk:
+        yield chunk
+
+
+def iter_sentence_spans(text, width, pauses=(), overlap=0, first_width=None, tokenizer=None):
+    # Packs whole words like the other chunkers, but ends a chunk after the last sentence
+    # end or caption pause (`pauses`: sorted offsets of the separators between segments
+    # with a gap) found in its second half. Each chunk after the first starts about
+    # `overlap` characters (or tokens, with a tokenizer) before the end of the previous one.
+    return WordIndex(text).sentence_spans(width, pauses, overlap, first_width, tokenizer)
+
+
+class WordIndex:
+    # Word boundaries of a whitespace-normalised text, found once so that the text can be
+    # re-chunked at any size without scanning it again. Each chunk is then located by a
+    # binary search over the word ends (or the running token counts), so re-chunking
+    # costs O(chunks * log(words)) instead of a pass over the whole transcript.
+    def __init__(self, text):
+        self.text = text
+        self.starts = array('q')
+        self.ends = array('q')
+        for match in WORD_RE.finditer(text):
+            self.starts.append(match.start())
+            self.ends.append(match.end())
+        self.tokenizer = None
+        self.cumulative = None
+        self.boundaries = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def cumulative_tokens(self, tokenizer):
+        # cumulative[i] is the token count of the first i words, each counted with the
+        # leading space it has everywhere but at a chunk start (as _pack_words does)
+        if self.tokenizer is not tokenizer:
+            counts = {}
+            cumulative = array('q', [0])
+            total = 0
+            for start, end in zip(self.starts, self.ends):
+                word = self.text[start:end]
+                tokens = counts.get(word)
+                if tokens is None:
+                    tokens = counts[word] = tokenizer.count(" " + word)
+                total += tokens
+                cumulative.append(total)
+            self.cumulative = cumulative
+            self.tokenizer = tokenizer
+        return self.cumulative
+
+    def boundary_words(self, pauses=()):
+        # Indexes of the words that end a sentence or come right before a caption pause
+        key = tuple(pauses)
+        words = self.boundaries.get(key)
+        if words is None:
+            flags = _boundary_flags(self.text, self.starts, self.ends, key)
+            words = self.boundaries[key] = array('q', (index for index, flag in enumerate(flags) if flag))
+        return words
+
+    def spans(self, width, first_width=None):
+        # Same chunks as iter_spans(self.text, width, first_width)
+        current_width = check_widths(width, first_width)
+        starts = self.starts
+        ends = self.ends
+        if not starts:
+            return
+        pos = starts[0]
+        last_end = ends[-1]
+        while True:
+            limit = pos + current_width
+            if limit >= last_end:
+                yield pos, last_end
+                return
+            following = bisect_right(ends, limit)  # first word that does not end inside the chunk
+            if starts[following] <= limit and (starts[following] <= pos or ends[following] - starts[following] > current_width):
+                # No whole word fits, or the next word can never fit on its own: split it
+                yield pos, limit
+                pos = limit
+            else:
+                yield pos, ends[following - 1]
+                pos = starts[following]
+            current_width = width
+
+    def token_spans(self, budget, tokenizer, first_budget=None):
+        # Same chunks as iter_token_spans(self.text, budget, tokenizer, first_budget)
+        current_budget = check_widths(budget, first_budget)
+        cumulative = self.cumulative_tokens(tokenizer)
+        count = len(self.starts)
+        first = 0
+        while first < count:
+            following = max(first + 1, bisect_right(cumulative, cumulative[first] + current_budget) - 1)
+            yield self.starts[first], self.ends[following - 1]
+            first = following
+            current_budget = budget
+
+    def sentence_spans(self, width, pauses=(), overlap=0, first_width=None, tokenizer=None):
+        # Chunks of iter_sentence_spans. The largest chunk that fits is found by binary
+        # search, then the last boundary word inside it; a boundary only ends the chunk
+        # if the chunk is at least half full at that point.
+        current_width = check_widths(width, first_width)
+        starts = self.starts
+        ends = self.ends
+        count = len(starts)
+        boundaries = self.boundary_words(pauses)
+        cumulative = self.cumulative_tokens(tokenizer) if tokenizer is not None else None
+        first = 0
+        while first < count:
+            budget = current_width
+            if cumulative is not None:
+                last = max(first, bisect_right(cumulative, cumulative[first] + budget) - 2)
+            else:
+                last = max(first, bisect_right(ends, starts[first] + budget) - 1)
+            if last == count - 1:
+                yield starts[first], ends[last]
+                break
+            cut = last
+            index = bisect_right(boundaries, last) - 1
+            if index >= 0 and boundaries[index] >= first:
+                boundary = boundaries[index]
+                used = cumulative[boundary + 1] - cumulative[first] if cumulative is not None else ends[boundary] - starts[first]
+                if used * 2 >= budget:
+                    cut = boundary
+            yield starts[first], ends[cut]
+            if cut == count - 1:
+                break
+            # Step back over whole words to repeat up to `overlap` units of context
+            following = cut + 1
+            if overlap:
+                shared = min(overlap, budget // 2)
+                if cumulative is not None:
+                    following = bisect_left(cumulative, cumulative[cut + 1] - shared)
+                else:
+                    following = bisect_left(starts, ends[cut] - shared)
+                following = min(cut + 1, max(first + 1, following))
+            first = following
+            current_width = width
+
+
+def _boundary_flags(text, starts, ends, pauses):
+    # 1 for every word that ends a sentence or is the last word before a caption pause
+    flags = bytearray(len(starts))
+    for index, end in enumerate(ends):
+        last_char = text[end - 1]
+        if last_char in SENTENCE_END or (last_char in CLOSING and end - 2 >= starts[index] and text[end - 2] in SENTENCE_END):
+            flags[index] = 1
+    index = 0
+    for pause in pauses:
+        # Both lists are sorted, so one merge pass finds the word ending before each pause
+        while index + 1 < len(starts) and starts[index + 1] <= pause:
+            index += 1
+        if index < len(ends) and ends[index] <= pause:
+            flags[index] = 1
+    return flags
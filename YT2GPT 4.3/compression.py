@@ -0,0 +1,107 @@
+import re
+import time
+from itertools import chain, count
+
+try:
+    import numpy as np
+except ImportError:
+    # The pre-compression stage is only offered when NumPy is installed
+    np = None
+
+
+TERM_RE = re.compile(r"\w+")
+MAX_SENTENCE_WORDS = 40  # auto-generated captions have no punctuation; longer runs are cut
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+
+
+class CompressionReport:
+    def __init__(self, sentences=0, kept_sentences=0, original_chars=0, kept_chars=0, seconds=0.0):
+        self.sentences = sentences
+        self.kept_sentences = kept_sentences
+        self.original_chars = original_chars
+        self.kept_chars = kept_chars
+        self.seconds = seconds
+
+    def describe(self):
+        share = 100 * self.kept_chars / self.original_chars if self.original_chars else 100
+        return (f"Pre-compression kept {self.kept_sentences} of {self.sentences} sentences "
+                f"({share:.0f}% of the transcript, {self.seconds * 1000:.0f} ms).")
+
+
+def sentence_spans(words, pauses=(), max_words=MAX_SENTENCE_WORDS):
+    # (start, end) of every sentence of a WordIndex: up to a sentence end or caption
+    # pause, and at most `max_words` words
+    spans = []
+    first = 0
+    boundaries = list(words.boundary_words(pauses)) + [len(words) - 1]
+    for boundary in boundaries:
+        while boundary - first + 1 > max_words:
+            spans.append((words.starts[first], words.ends[first + max_words - 1]))
+            first += max_words
+        if boundary >= first:
+            spans.append((words.starts[first], words.ends[boundary]))
+            first = boundary + 1
+    return spans
+
+
+def textrank_scores(term_ids, sentence_ids, sentence_count):
+    # TextRank over the cosine similarity of the sentences' TF-IDF vectors. The similarity
+    # matrix S = X X^T is never built: X is kept as (sentence, term, weight) triples and
+    # S v is computed as X (X^T v), two np.bincount passes over the triples, so every
+    # iteration costs O(terms in the text) instead of O(sentences^2).
+    term_count = int(term_ids.max()) + 1 if len(term_ids) else 0
+    keys, counts = np.unique(sentence_ids.astype(np.int64) * term_count + term_ids, return_counts=True)
+    rows = keys // term_count
+    columns = keys % term_count
+    document_frequency = np.bincount(columns, minlength=term_count)
+    idf = np.log(sentence_count / document_frequency)
+    weights = (1 + np.log(counts)) * idf[columns]
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=sentence_count))
+    weights = weights / np.where(norms > 0, norms, 1)[rows]
+    self_similarity = np.where(norms > 0, 1.0, 0.0)
+
+    def similarity_times(vector):
+        # S v without the diagonal (a sentence does not vote for itself)
+        by_term = np.bincount(columns, weights=weights * vector[rows], minlength=term_count)
+        return np.bincount(rows, weights=weights * by_term[columns], minlength=sentence_count) - self_similarity * vector
+
+    degrees = similarity_times(np.ones(sentence_count))
+    degrees = np.where(degrees > 1e-12, degrees, np.inf)
+    scores = np.full(sentence_count, 1.0 / sentence_count)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1 - DAMPING) / sentence_count + DAMPING * similarity_times(scores / degrees)
+        converged = np.abs(updated - scores).sum() < TOLERANCE
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def compress_spans(text, words, ratio, pauses=()):
+    # Returns (spans, CompressionReport): the (start, end) offsets of the most informative
+    # sentences of `text` (with its WordIndex), about `ratio` of its characters in total,
+    # in their original order
+    started = time.perf_counter()
+    spans = sentence_spans(words, pauses) if len(words) else []
+    lengths = np.array([end - start for start, end in spans], dtype=np.int64)
+    original_chars = int(lengths.sum())
+    if len(spans) < 2 or ratio >= 1:
+        return spans, CompressionReport(len(spans), len(spans), original_chars, original_chars, time.perf_counter() - started)
+    # Term IDs without a Python-level loop per word: each term keeps the first number
+    # count() handed out for it, and np.unique makes the numbers consecutive
+    lowered = text.lower()
+    sentence_terms = list(map(TERM_RE.findall, [lowered[start:end] for start, end in spans]))
+    vocabulary = {}
+    first_seen = list(map(vocabulary.setdefault, chain.from_iterable(sentence_terms), count()))
+    term_ids = np.unique(np.array(first_seen, dtype=np.int64), return_inverse=True)[1]
+    sentence_ids = np.repeat(np.arange(len(spans)), list(map(len, sentence_terms)))
+    scores = textrank_scores(term_ids, sentence_ids, len(spans))
+    # Best sentences first until the target size is reached, then back in transcript order
+    order = np.argsort(-scores, kind="stable")
+    kept_count = int(np.searchsorted(np.cumsum(lengths[order]), ratio * original_chars)) + 1
+    kept = np.sort(order[:kept_count])
+    kept_chars = int(lengths[kept].sum())
+    report = CompressionReport(len(spans), len(kept), original_chars, kept_chars, time.perf_counter() - started)
+    return [spans[index] for index in kept], report
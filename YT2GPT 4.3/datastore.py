@@ -0,0 +1,353 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from json_store import DELETED, WriteBehindStore, read_json
+from transcripts import TranscriptUnavailable
+
+
+# Every lookup the app makes (video ID, profile name, setting key, run date) goes through
+# a primary key or an index, so it stays O(log n) with tens of thousands of videos
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT PRIMARY KEY,
+    kind TEXT,
+    language_code TEXT,
+    error TEXT,
+    segment_count INTEGER NOT NULL DEFAULT 0,
+    duration REAL NOT NULL DEFAULT 0,
+    segments BLOB,
+    size INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS transcripts_fetched_at ON transcripts (fetched_at);
+CREATE TABLE IF NOT EXISTS profiles (
+    name TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    end_prompt TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    options TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_video_id ON runs (video_id, started_at);
+CREATE TABLE IF NOT EXISTS passages (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    chunk INTEGER NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS passages_video_id ON passages (video_id);
+"""
+# Full-text index of the passages, row for row (rowid = passages.id)
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS passage_text USING fts5 (text, tokenize = 'unicode61 remove_diacritics 2')"
+INDEX_CHUNK_CHARS = 1000  # transcripts are indexed in chunks of about this many characters
+QUERY_RE = re.compile(r'"([^"]*)"?|(\S+)')
+WORD_RE = re.compile(r"\w+")
+# Ranking costs time per matching chunk; by default words found nearly everywhere only have
+# their most recently indexed matches ranked, so no query gets slower as the corpus grows
+MAX_RANKED_CHUNKS = 5000
+
+
+def fts_query(text):
+    # User query -> FTS5 query: every word and every "quoted phrase" must match. Words are
+    # quoted, so characters with a meaning in FTS5 (*, -, :, ^, NEAR...) are just text.
+    terms = []
+    for phrase, word in QUERY_RE.findall(text):
+        words = WORD_RE.findall(phrase or word)
+        if words:
+            terms.append('"' + " ".join(words) + '"')
+    return " ".join(terms)
+
+
+def index_chunks(segments, size=INDEX_CHUNK_CHARS):
+    # Consecutive segments grouped into (text, start, end) chunks of about `size` characters
+    texts = []
+    length = 0
+    start = None
+    for item in segments:
+        if start is None:
+            start = item['start']
+        texts.append(item['text'])
+        length += len(item['text']) + 1
+        if length >= size:
+            yield " ".join(texts), start, item['start'] + item['duration']
+            texts = []
+            length = 0
+            start = None
+    if texts:
+        yield " ".join(texts), start, item['start'] + item['duration']
+
+
+class SearchHit:
+    def __init__(self, video_id, chunk, start, end, snippet, score):
+        self.video_id = video_id
+        self.chunk = chunk  # 1-based number of the index chunk, see INDEX_CHUNK_CHARS
+        self.start = start
+        self.end = end
+        self.snippet = snippet  # matching words in [brackets]
+        self.score = score  # BM25, lower is better
+
+
+class Datastore:
+    # One SQLite file holding the fetched transcripts, profiles, settings and run history.
+    # The connection is shared by the GUI and worker threads behind a lock; WAL mode lets
+    # other processes read while one writes. Also usable as the transcript cache of
+    # load_transcript (lookup, store, store_unavailable). Stored transcripts are bounded by
+    # count and by size (compressed segments); the least recently used go first.
+    # Searches rank at most `max_ranked` matching chunks (None: all of them).
+    def __init__(self, path="yt2gpt.db", ttl=7 * 24 * 3600, negative_ttl=24 * 3600,
+                 max_entries=20000, max_bytes=1024 * 1024 * 1024, max_ranked=MAX_RANKED_CHUNKS):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_ranked = max_ranked
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.lock:
+            self.connection.executescript(SCHEMA)
+            self.add_missing_columns()
+            try:
+                self.connection.execute(FTS_SCHEMA)
+                self.searchable = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: everything but search still works
+                self.searchable = False
+        self.index_checked = False
+
+    def add_missing_columns(self):
+        # Databases created before the size limits lack the bookkeeping columns
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(transcripts)")}
+        if "size" not in columns:
+            self.connection.execute("ALTER TABLE transcripts ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            self.connection.execute("UPDATE transcripts SET size = length(segments) WHERE segments IS NOT NULL")
+        if "accessed_at" not in columns:
+            self.connection.execute("ALTER TABLE transcripts ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0")
+            self.connection.execute("UPDATE transcripts SET accessed_at = fetched_at")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS transcripts_accessed_at ON transcripts (accessed_at)")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def transaction(self, statements):
+        # statements: (sql, parameters) pairs, committed together or not at all
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, parameters in statements:
+                    self.connection.execute(sql, parameters)
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def query(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    # Transcripts
+
+    def lookup(self, video_id):
+        rows = self.query("SELECT kind, language_code, error, segments, fetched_at FROM transcripts WHERE video_id = ?", (video_id,))
+        if not rows:
+            return None
+        kind, language_code, error, segments, fetched_at = rows[0]
+        ttl = self.negative_ttl if error is not None else self.ttl
+        if ttl is not None and time.time() - fetched_at > ttl:
+            return None
+        self.transaction([("UPDATE transcripts SET accessed_at = ? WHERE video_id = ?", (time.time(), video_id))])
+        if error is not None:
+            raise TranscriptUnavailable(error)
+        return {"kind": kind, "language_code": language_code}, json.loads(zlib.decompress(segments))
+
+    def store(self, video_id, track, segments):
+        # Segments are kept as compressed JSON: about a tenth of their size as text
+        blob = zlib.compress(json.dumps(segments, separators=(",", ":")).encode("utf-8"))
+        duration = max((item['start'] + item['duration'] for item in segments), default=0)
+        # The search index is updated in the same transaction, so it never disagrees with the transcripts
+        now = time.time()
+        self.transaction([(
+            "INSERT OR REPLACE INTO transcripts (video_id, kind, language_code, error, segment_count, duration, segments, size, fetched_at, accessed_at) "
+            "VALUES (?, ?, ?, NULL, ?, ?, ?, ?, ?, ?)",
+            (video_id, track["kind"], track["language_code"], len(segments), duration, blob, len(blob), now, now),
+        )] + self.index_statements(video_id, segments))
+        self.evict()
+
+    def store_unavailable(self, video_id, message):
+        now = time.time()
+        self.transaction([(
+            "INSERT OR REPLACE INTO transcripts (video_id, error, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (video_id, message, now, now),
+        )] + self.index_statements(video_id, []))
+        self.evict()
+
+    def evict(self):
+        # Removes the least recently used transcripts, with their search index entries,
+        # until both limits hold (None: no limit). The run history is kept.
+        with self.lock:
+            count, size = self.query("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts")[0]
+            while self.over_limits(count, size):
+                statements = []
+                for video_id, entry_size in self.query("SELECT video_id, size FROM transcripts ORDER BY accessed_at LIMIT 100"):
+                    if not self.over_limits(count, size):
+                        break
+                    statements.append(("DELETE FROM transcripts WHERE video_id = ?", (video_id,)))
+                    statements.extend(self.index_statements(video_id, []))
+                    count -= 1
+                    size -= entry_size
+                self.transaction(statements)
+
+    def over_limits(self, count, size):
+        return (self.max_entries is not None and count > self.max_entries) or (self.max_bytes is not None and size > self.max_bytes)
+
+    # Full-text search
+
+    def index_statements(self, video_id, segments):
+        if not self.searchable:
+            return []
+        statements = [
+            ("DELETE FROM passage_text WHERE rowid IN (SELECT id FROM passages WHERE video_id = ?)", (video_id,)),
+            ("DELETE FROM passages WHERE video_id = ?", (video_id,)),
+        ]
+        for chunk, (text, start, end) in enumerate(index_chunks(segments), 1):
+            statements.append(("INSERT INTO passages (video_id, chunk, start_time, end_time) VALUES (?, ?, ?, ?)", (video_id, chunk, start, end)))
+            statements.append(("INSERT INTO passage_text (rowid, text) VALUES (last_insert_rowid(), ?)", (text,)))
+        return statements
+
+    def index_missing(self):
+        # Indexes the transcripts stored before the search index existed
+        missing = self.query("SELECT video_id FROM transcripts WHERE error IS NULL "
+                             "AND NOT EXISTS (SELECT 1 FROM passages WHERE passages.video_id = transcripts.video_id)")
+        for (video_id,) in missing:
+            rows = self.query("SELECT segments FROM transcripts WHERE video_id = ?", (video_id,))
+            self.transaction(self.index_statements(video_id, json.loads(zlib.decompress(rows[0][0]))))
+        self.index_checked = True
+
+    def search(self, text, limit=20):
+        # Returns (hits, truncated): the best matches first (BM25), as SearchHit objects, and
+        # whether more than `max_ranked` chunks matched, so only the newest were ranked.
+        # Words must all appear in the same index chunk; "quoted words" must appear
+        # together, in that order.
+        if not self.searchable:
+            raise RuntimeError("Search needs SQLite with FTS5, which this Python build lacks.")
+        query = fts_query(text)
+        if not query:
+            return [], False
+        if not self.index_checked:
+            self.index_missing()
+        after = 0
+        if self.max_ranked:
+            # Newest matches first, stopping after max_ranked + 1 (cheap: no ranking)
+            candidates = self.query("SELECT rowid FROM passage_text WHERE passage_text MATCH ? ORDER BY rowid DESC LIMIT ?",
+                                    (query, self.max_ranked + 1))
+            if not candidates:
+                return [], False
+            if len(candidates) > self.max_ranked:
+                after = candidates[-1][0]
+        rows = self.query(
+            "SELECT passages.video_id, passages.chunk, passages.start_time, passages.end_time, hits.snippet, hits.score "
+            "FROM (SELECT rowid, snippet(passage_text, 0, '[', ']', '...', 16) AS snippet, rank AS score "
+            "      FROM passage_text WHERE passage_text MATCH ? AND rowid > ? ORDER BY rank LIMIT ?) AS hits "
+            "JOIN passages ON passages.id = hits.rowid ORDER BY hits.score", (query, after, limit))
+        return [SearchHit(*row) for row in rows], after > 0
+
+    def transcripts_fetched_between(self, start, end):
+        # (video ID, track kind, language, segment count, duration, fetched at), oldest first
+        return self.query("SELECT video_id, kind, language_code, segment_count, duration, fetched_at FROM transcripts "
+                          "WHERE fetched_at >= ? AND fetched_at < ? AND error IS NULL ORDER BY fetched_at", (start, end))
+
+    def clear_transcripts(self):
+        statements = [("DELETE FROM transcripts", ()), ("DELETE FROM passages", ())]
+        if self.searchable:
+            statements.append(("DELETE FROM passage_text", ()))
+        self.transaction(statements)
+
+    # Run history
+
+    def record_run(self, video_id, chunk_count, options, started_at=None):
+        self.transaction([(
+            "INSERT INTO runs (video_id, started_at, chunk_count, options) VALUES (?, ?, ?, ?)",
+            (video_id, started_at or time.time(), chunk_count, json.dumps(options)),
+        )])
+
+    def runs_between(self, start, end):
+        return self._runs("WHERE started_at >= ? AND started_at < ? ORDER BY started_at", (start, end))
+
+    def runs_for_video(self, video_id):
+        return self._runs("WHERE video_id = ? ORDER BY started_at", (video_id,))
+
+    def recent_runs(self, limit=50):
+        return self._runs("ORDER BY started_at DESC LIMIT ?", (limit,))
+
+    def _runs(self, clause, parameters):
+        rows = self.query(f"SELECT video_id, started_at, chunk_count, options FROM runs {clause}", parameters)
+        return [{"video_id": video_id, "started_at": started_at, "chunk_count": chunk_count, "options": json.loads(options)}
+                for video_id, started_at, chunk_count, options in rows]
+
+    # Settings and profiles, see TableStore
+
+    def read_table(self, table):
+        if table == "settings":
+            return {key: json.loads(value) for key, value in self.query("SELECT key, value FROM settings")}
+        return {name: {"prompt": prompt, "end_prompt": end_prompt}
+                for name, prompt, end_prompt in self.query("SELECT name, prompt, end_prompt FROM profiles ORDER BY rowid")}
+
+    def write_table(self, table, changes):
+        statements = []
+        for key, value in changes.items():
+            if value is DELETED:
+                statements.append((f"DELETE FROM {table} WHERE {'key' if table == 'settings' else 'name'} = ?", (key,)))
+            elif table == "settings":
+                statements.append(("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, json.dumps(value))))
+            else:
+                # An upsert keeps the rowid, so an edited profile keeps its place in the list
+                statements.append(("INSERT INTO profiles (name, prompt, end_prompt, updated_at) VALUES (?, ?, ?, ?) "
+                                   "ON CONFLICT (name) DO UPDATE SET prompt = excluded.prompt, end_prompt = excluded.end_prompt, updated_at = excluded.updated_at",
+                                   (key, value["prompt"], value["end_prompt"], time.time())))
+        self.transaction(statements)
+
+    def import_json(self, table, path):
+        # One-time migration of a JSON file (profiles.json of earlier versions) into an empty table
+        if not os.path.exists(path) or self.query(f"SELECT 1 FROM {table} LIMIT 1"):
+            return
+        data = read_json(path)
+        if table == "profiles":
+            data = {name: profile for name, profile in data.items() if isinstance(profile, dict) and "prompt" in profile}
+            for profile in data.values():
+                profile.setdefault("end_prompt", "")
+        if data:
+            self.write_table(table, data)
+
+
+class TableStore(WriteBehindStore):
+    # The settings or profiles table of a Datastore, written behind (see WriteBehindStore):
+    # the changed keys are written in one transaction.
+    def __init__(self, datastore, table, delay=1.0):
+        self.datastore = datastore
+        self.table = table
+        super().__init__(delay)
+
+    def read(self):
+        return self.datastore.read_table(self.table)
+
+    def write(self, changes):
+        self.datastore.write_table(self.table, changes)
@@ -0,0 +1,88 @@
+from collections import deque
+
+
+HASH_BASE = 1000003
+HASH_MODULUS = (1 << 61) - 1
+
+
+class DedupStats:
+    def __init__(self):
+        self.original_chars = 0
+        self.kept_chars = 0
+        self.dropped_words = 0
+        self.dropped_segments = 0
+        self.dropped = []  # the removed runs, to count the tokens they would have cost
+
+    @property
+    def saved_chars(self):
+        return self.original_chars - self.kept_chars
+
+    def saved_tokens(self, tokenizer):
+        return sum(tokenizer.count(" " + run) for run in self.dropped)
+
+    def describe(self, tokenizer=None):
+        if tokenizer is not None:
+            saved = f"{self.saved_tokens(tokenizer)} tokens"
+        else:
+            saved = f"{self.saved_chars} characters"
+        percent = 100 * self.saved_chars / self.original_chars if self.original_chars else 0
+        return f"Removed {self.dropped_words} repeated caption words ({saved}, {percent:.1f}% of the text)."
+
+
+def iter_deduped(segments, stats=None, min_words=3, max_words=64):
+    # Auto-generated captions repeat the end of one line at the start of the next.
+    # For each segment, the longest run of its first words (at least `min_words`, at most
+    # `max_words`) that equals the last words kept so far is dropped. The run is found by
+    # comparing rolling hashes of the segment's prefixes with those of the kept suffixes,
+    # which costs O(words) per segment, so the whole pass is linear.
+    if stats is None:
+        stats = DedupStats()
+    ids = {}
+    tail = deque(maxlen=max_words)  # ids of the last kept words
+    first = True
+    for item in segments:
+        text = item['text']
+        stats.original_chars += len(text) + (0 if first else 1)
+        words = text.split()
+        keys = [ids.setdefault(word.lower(), len(ids)) for word in words]
+        overlap = _longest_overlap(tail, keys, min_words)
+        if overlap:
+            stats.dropped_words += overlap
+            stats.dropped.append(" ".join(words[:overlap]))
+            if overlap == len(words):
+                stats.dropped_segments += 1
+                continue
+            item = dict(item, text=" ".join(words[overlap:]))
+        stats.kept_chars += len(item['text']) + (0 if first else 1)
+        first = False
+        tail.extend(keys)
+        yield item
+
+
+def dedupe_segments(segments, min_words=3, max_words=64):
+    # Returns (deduplicated segments, DedupStats)
+    stats = DedupStats()
+    return list(iter_deduped(segments, stats, min_words, max_words)), stats
+
+
+def _longest_overlap(tail, keys, min_words):
+    # Largest k >= min_words such that the last k keys of `tail` equal keys[:k], or 0
+    longest = min(len(tail), len(keys))
+    if longest < min_words:
+        return 0
+    suffix_keys = [tail[-k] for k in range(1, longest + 1)]  # tail read backwards
+    prefix_hash = 0
+    suffix_hash = 0
+    power = 1
+    candidates = []
+    for k in range(1, longest + 1):
+        prefix_hash = (prefix_hash * HASH_BASE + keys[k - 1] + 1) % HASH_MODULUS
+        suffix_hash = (suffix_hash + (suffix_keys[k - 1] + 1) * power) % HASH_MODULUS
+        power = power * HASH_BASE % HASH_MODULUS
+        if k >= min_words and prefix_hash == suffix_hash:
+            candidates.append(k)
+    # Hash matches are confirmed word by word, longest first
+    for k in reversed(candidates):
+        if all(suffix_keys[k - 1 - j] == keys[j] for j in range(k)):
+            return k
+    return 0
@@ -0,0 +1,81 @@
+import gzip
+import json
+import os
+import re
+
+
+EXPORT_FORMATS = ("jsonl", "md", "txt")
+FILE_FILTERS = "JSON Lines (*.jsonl);;Markdown (*.md);;Text (*.txt);;Compressed JSON Lines (*.jsonl.gz);;Compressed Markdown (*.md.gz);;Compressed text (*.txt.gz)"
+BACKTICKS_RE = re.compile(r"`{3,}")
+
+
+def export_format(path):
+    # "prompts.md.gz" -> "md"
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lstrip(".").lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{extension}', expected one of: {', '.join('.' + name for name in EXPORT_FORMATS)} (optionally .gz).")
+    return extension
+
+
+class PromptExporter:
+    # Writes prompts to disk one at a time, as they are rendered, so an export never holds
+    # more than one prompt in memory. Output goes to a temporary file that replaces `path`
+    # on close, so a failed export never leaves a truncated file behind.
+    def __init__(self, path, format=None, compress=None):
+        self.path = path
+        self.format = format or export_format(path)
+        self.compress = path.endswith(".gz") if compress is None else compress
+        self.tmp_path = path + ".tmp"
+        self.count = 0
+        if self.compress:
+            self.file = gzip.open(self.tmp_path, 'wt', encoding="utf-8")
+        else:
+            self.file = open(self.tmp_path, 'w', encoding="utf-8")
+
+    def write_prompt(self, video_id, index, total, prompt, time_range=""):
+        position = f"{index+1}/{total}" if total else f"{index+1}"
+        if self.format == "jsonl":
+            self.write_record({"type": "prompt", "video_id": video_id, "index": index + 1, "total": total or None, "time_range": time_range, "text": prompt})
+        else:
+            title = f"{video_id} - chunk {position}" + (f" ({time_range})" if time_range else "")
+            self.write_section(title, prompt)
+        self.count += 1
+
+    def write_final(self, video_id, text):
+        if self.format == "jsonl":
+            self.write_record({"type": "final", "video_id": video_id, "text": text})
+        else:
+            self.write_section(f"{video_id} - final text", text)
+
+    def write_record(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False))
+        self.file.write("\n")
+
+    def write_section(self, title, text):
+        if self.format == "md":
+            # The fence is longer than any backtick run in the text, so it cannot be closed early
+            fence = "`" * max([3] + [len(run) + 1 for run in BACKTICKS_RE.findall(text)])
+            self.file.write(f"## {title}\n\n{fence}\n{text}\n{fence}\n\n")
+        else:
+            self.file.write(f"===== {title} =====\n{text}\n\n")
+
+    def close(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
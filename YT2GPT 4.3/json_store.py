@@ -0,0 +1,68 @@
+import atexit
+import json
+import threading
+
+
+DELETED = object()  # marks a removed key in the pending changes
+
+
+def read_json(path):
+    # The object in a JSON file; {} if the file is missing, damaged or not an object
+    try:
+        with open(path, 'r') as file:
+            data = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+class WriteBehindStore:
+    # A key/value mapping held in memory (`data`). Changes are coalesced and written
+    # behind: at most `delay` seconds after the first unsaved change, on flush(), or at
+    # exit. Subclasses implement read() and write(changes), where `changes` maps each
+    # changed key to its new value or DELETED; only those keys are written, so several
+    # processes sharing the same storage keep each other's changes.
+    def __init__(self, delay=1.0):
+        self.delay = delay
+        self.lock = threading.RLock()
+        self.pending = {}
+        self.timer = None
+        self.data = self.read()
+        atexit.register(self.flush)
+
+    def read(self):
+        raise NotImplementedError
+
+    def write(self, changes):
+        raise NotImplementedError
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.pending[key] = value
+            self.schedule()
+
+    def pop(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+            self.pending[key] = DELETED
+            self.schedule()
+
+    def schedule(self):
+        if self.timer is None:
+            self.timer = threading.Timer(self.delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pending:
+                return
+            self.write(self.pending)
+            self.pending = {}
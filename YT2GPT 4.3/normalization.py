@@ -0,0 +1,128 @@
+import html
+import os
+import re
+import time
+
+
+SEPARATOR = "\x00"  # joins the segments; no rule can match or remove it
+# Only sounds that are not words in common caption languages: "um" is a German
+# preposition and "mm" a unit, so neither is removed by default
+FILLER_WORDS = ("umm", "uh", "uhm", "erm", "hmm")
+# Only these tags are removed, so bracketed text such as a[i] or [1] is kept
+SOUND_TAGS = ("music", "applause", "laughter", "laughs", "laughing", "inaudible", "silence", "cheering",
+              "cheers", "crosstalk", "noise", "foreign", "music playing", "background music", "speaking foreign language")
+DEFAULT_RULES = ("html_entities", "sound_tags", "newlines", "fillers", "spaces")
+PARALLEL_MIN_CHARS = 2000000  # below this, starting processes costs more than it saves
+STREAM_BATCH_SEGMENTS = 2000  # segments cleaned at a time when streaming
+
+
+def _unescape(match):
+    return html.unescape(match.group())
+
+
+def rule_patterns(filler_words=FILLER_WORDS, sound_tags=SOUND_TAGS):
+    # name -> (pattern, flags, replacement), in the order the rules are applied
+    fillers = "|".join(re.escape(word) for word in filler_words) or r"(?!)"
+    tags = "|".join(re.escape(tag).replace(r"\ ", " +") for tag in sound_tags) or r"(?!)"
+    return {
+        "html_entities": (r"&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);", 0, _unescape),
+        # [Music], [Applause], (laughs), [inaudible]... and music notes
+        "sound_tags": (rf"[\[(] *(?:{tags}) *[\])]|♪+", re.IGNORECASE, " "),
+        "newlines": (r"[\r\n\t\x0b\x0c]+", 0, " "),
+        "fillers": (rf"\b(?:{fillers})\b,?", re.IGNORECASE, ""),
+        "spaces": (r" {2,}", 0, " "),
+    }
+
+
+class NormalizationReport:
+    def __init__(self, original_chars=0, kept_chars=0, timings=None):
+        self.original_chars = original_chars
+        self.kept_chars = kept_chars
+        self.timings = timings or {}
+
+    @property
+    def removed_chars(self):
+        return self.original_chars - self.kept_chars
+
+    def describe(self):
+        costs = ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.timings.items())
+        return f"Caption cleanup removed {self.removed_chars} characters ({costs})."
+
+
+class NormalizationPipeline:
+    # Caption cleanup rules compiled once and applied to a whole transcript at a time:
+    # the segments are joined with SEPARATOR so that every rule is one regex pass over
+    # one string instead of one call per segment, then split back.
+    def __init__(self, rules=DEFAULT_RULES, filler_words=FILLER_WORDS, sound_tags=SOUND_TAGS):
+        patterns = rule_patterns(filler_words, sound_tags)
+        self.names = [name for name in patterns if name in rules]
+        unknown = set(rules) - set(patterns)
+        if unknown:
+            raise ValueError(f"Unknown normalization rule(s): {', '.join(sorted(unknown))}")
+        self.filler_words = tuple(filler_words)
+        self.sound_tags = tuple(sound_tags)
+        self.rules = [(name, re.compile(patterns[name][0], patterns[name][1]), patterns[name][2]) for name in self.names]
+
+    def normalize_texts(self, texts, timings=None):
+        # Returns the cleaned texts (same count and order); `timings` collects seconds per rule
+        joined = SEPARATOR.join(text.replace(SEPARATOR, "") for text in texts)
+        for name, pattern, replacement in self.rules:
+            started = time.perf_counter()
+            joined = pattern.sub(replacement, joined)
+            if timings is not None:
+                timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+        return [text.strip(" ") for text in joined.split(SEPARATOR)]
+
+    def normalize_segments(self, segments, executor=None, workers=None):
+        # Returns (segments, NormalizationReport). Segments left empty are dropped.
+        # With a process pool `executor`, large transcripts are cut into one part per
+        # worker; the timings are then summed over the workers.
+        texts = [item['text'] for item in segments]
+        original_chars = sum(len(text) for text in texts)
+        timings = dict.fromkeys(self.names, 0.0)
+        if executor is not None and original_chars >= PARALLEL_MIN_CHARS:
+            part_count = workers or os.cpu_count() or 1
+            size = -(-len(texts) // part_count)
+            parts = [texts[start:start + size] for start in range(0, len(texts), size)]
+            cleaned = []
+            for part_texts, part_timings in executor.map(_normalize_part, [(self.names, self.filler_words, self.sound_tags, part) for part in parts]):
+                cleaned.extend(part_texts)
+                for name, seconds in part_timings.items():
+                    timings[name] += seconds
+        else:
+            cleaned = self.normalize_texts(texts, timings)
+        result = [dict(item, text=text) for item, text in zip(segments, cleaned) if text]
+        return result, NormalizationReport(original_chars, sum(len(text) for text in cleaned), timings)
+
+    def iter_normalized(self, segments, report=None, batch_size=STREAM_BATCH_SEGMENTS):
+        # Lazy normalize_segments for streaming: segments are read and cleaned `batch_size`
+        # at a time, so only one batch is ever joined. No rule matches across SEPARATOR,
+        # so the result is the same as cleaning the whole transcript at once. `report`
+        # (a NormalizationReport) is filled in as the segments are consumed.
+        if report is None:
+            report = NormalizationReport()
+        for name in self.names:
+            report.timings.setdefault(name, 0.0)
+        batch = []
+        for item in segments:
+            batch.append(item)
+            if len(batch) < batch_size:
+                continue
+            yield from self._normalize_batch(batch, report)
+            batch = []
+        yield from self._normalize_batch(batch, report)
+
+    def _normalize_batch(self, batch, report):
+        texts = [item['text'] for item in batch]
+        cleaned = self.normalize_texts(texts, report.timings)
+        report.original_chars += sum(len(text) for text in texts)
+        report.kept_chars += sum(len(text) for text in cleaned)
+        return [dict(item, text=text) for item, text in zip(batch, cleaned) if text]
+
+
+def _normalize_part(job):
+    # Runs in a worker process, so the pipeline is rebuilt from its settings
+    names, filler_words, sound_tags, texts = job
+    timings = {}
+    texts = NormalizationPipeline(names, filler_words, sound_tags).normalize_texts(texts, timings)
+    return texts, timings
@@ -0,0 +1,78 @@
+import re
+
+
+PLACEHOLDERS = ("language", "index", "total", "position", "chunk", "start_time", "end_time")
+_NAMES = "|".join(PLACEHOLDERS)
+PLACEHOLDER_RE = re.compile(rf"\{{\{{({_NAMES})\}}\}}|\{{({_NAMES})\}}")
+LAYOUTS = ("standard", "compact", "prefix-cache")
+
+DEFAULT_FIRST_PROMPT = "From now, you will write in [{language}]. I will provide you with a transcription of spoken content, and I need your help to understand what was said. Please listen carefully and provide a concise bullet-point summary of the main ideas and key points covered in the given text. Include the essential concepts, arguments, or findings, and emphasize any important details or supporting evidence. Make sure to mention the topics discussed in the text and organize your response in a clear and coherent bullet list format. Your summary should condense the information while maintaining accuracy and provide a comprehensive overview of the text's content. Separatly, you will note all the stastictics and formulas."
+DEFAULT_NEXT_PROMPT = "Continue to listen and provide a concise bullet-point summary in [{language}]. Note all the stastictics and formulas separately."
+DEFAULT_END_PROMPT = "Remember to summarize key ideas in bullet points. Note statistics and formulas separately in [{language}]."
+PARTS_NOTE = "The transcript is sent in parts, each starting with [CHUNK i/n]. Apply these instructions to every part."
+MARKED_CHUNK = "[CHUNK {position}]\n{chunk}"
+
+
+class PromptTemplate:
+    # Prompt text with named placeholders ({language}, {index}, {total}, {position},
+    # {chunk}, {start_time}, {end_time}). The text is parsed once into a format string
+    # in which every other brace is escaped, so rendering a chunk is a single
+    # str.format_map call and user text with literal braces can never break it.
+    # "{{chunk}}" is kept as the literal text "{chunk}".
+    def __init__(self, source):
+        self.source = source
+        parts = []
+        fields = set()
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            parts.append(_escape(source[position:match.start()]))
+            if match.group(1):
+                parts.append(_escape("{" + match.group(1) + "}"))
+            else:
+                parts.append("{" + match.group(2) + "}")
+                fields.add(match.group(2))
+            position = match.end()
+        parts.append(_escape(source[position:]))
+        self.format = "".join(parts)
+        self.fields = frozenset(fields)
+
+    def render(self, values):
+        # `values` maps placeholder names to text; placeholders not in it render empty
+        return self.format.format_map(_Values(values))
+
+
+class _Values(dict):
+    def __missing__(self, key):
+        return ""
+
+
+def _escape(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def build_layout(prompt, end_prompt, layout="standard"):
+    # Returns the (first chunk, other chunks) templates of a layout. The user's prompts are
+    # templates themselves; a prompt containing {chunk} is used as the whole layout.
+    end_text = f"{end_prompt}. Write in [{{language}}]." if end_prompt else DEFAULT_END_PROMPT
+    head = f"{prompt}. Write in [{{language}}]." if prompt else DEFAULT_FIRST_PROMPT
+    custom = f"{prompt}\n{end_text}" if end_prompt else prompt
+    custom_layout = prompt and "chunk" in PromptTemplate(prompt).fields
+    if layout == "compact":
+        # The instructions and the reminder are sent once, with the first chunk;
+        # the other chunks only carry a marker
+        first = custom if custom_layout else f"{head} {end_text} {PARTS_NOTE}\n{MARKED_CHUNK}"
+        return PromptTemplate(first), PromptTemplate(MARKED_CHUNK)
+    if layout == "prefix-cache":
+        # Every prompt starts with the same static instructions, byte for byte, and all that
+        # changes per chunk comes after them, so a server that caches the evaluated prompt
+        # prefix (llama.cpp's cache_prompt) only evaluates the new chunk. Placeholders such
+        # as {index} or {start_time} in the user's prompt would break that.
+        template = PromptTemplate(custom if custom_layout else f"{head} {end_text} {PARTS_NOTE}\n{MARKED_CHUNK}")
+        return template, template
+    if layout != "standard":
+        raise ValueError(f"Unknown prompt layout: {layout}")
+    if custom_layout:
+        template = PromptTemplate(custom)
+        return template, template
+    heads = (head, head) if prompt else (DEFAULT_FIRST_PROMPT, DEFAULT_NEXT_PROMPT)
+    return tuple(PromptTemplate(f"{head} >[START CHUNK {{position}}]\n{{chunk}}\n[END CHUNK {{position}}]< {end_text}") for head in heads)
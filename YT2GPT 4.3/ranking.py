@@ -0,0 +1,61 @@
+import heapq
+import math
+import re
+from array import array
+from collections import Counter
+
+
+WORD_RE = re.compile(r"\w+")
+
+
+def terms(text):
+    return WORD_RE.findall(text.lower())
+
+
+class BM25Index:
+    # In-memory inverted index over the chunks of one transcript: term -> postings
+    # (chunk numbers and term counts, as arrays), plus the length of every chunk. It is
+    # built in one pass over the chunks; a query then only reads the postings of its words.
+    def __init__(self, texts, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.lengths = array('l')
+        self.postings = {}
+        for chunk, text in enumerate(texts):
+            counts = Counter(terms(text))
+            self.lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = (array('l'), array('l'))
+                postings[0].append(chunk)
+                postings[1].append(count)
+        self.average_length = (sum(self.lengths) / len(self.lengths) if self.lengths else 0) or 1
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def scores(self, query):
+        # BM25 score of every chunk for the query words (0 for chunks without any of them)
+        scores = [0.0] * len(self.lengths)
+        k1, b = self.k1, self.b
+        for term in set(terms(query)):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            chunks, counts = postings
+            idf = math.log(1 + (len(self.lengths) - len(chunks) + 0.5) / (len(chunks) + 0.5))
+            for chunk, count in zip(chunks, counts):
+                norm = k1 * (1 - b + b * self.lengths[chunk] / self.average_length)
+                scores[chunk] += idf * count * (k1 + 1) / (count + norm)
+        return scores
+
+    def select(self, query, top_k=None, min_score=None):
+        # Numbers of the chunks to keep, in transcript order: the `top_k` best and/or those
+        # scoring at least `min_score`. Chunks without any query word are never kept.
+        scores = self.scores(query)
+        threshold = 0.0 if min_score is None else min_score
+        matching = [chunk for chunk, score in enumerate(scores) if score > 0 and score >= threshold]
+        if top_k is not None:
+            matching = heapq.nlargest(top_k, matching, key=scores.__getitem__)
+        return sorted(matching)
@@ -0,0 +1,106 @@
+import math
+from array import array
+from bisect import bisect_right
+from chunking import normalize_whitespace
+
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def parse_timestamp(text):
+    # "1:02:03", "62:03" or "3723" (seconds)
+    seconds = 0.0
+    for part in text.strip().split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_time_ranges(text):
+    # "1:00:00-1:30:00, 2:10:00-2:20:00" -> [(3600.0, 5400.0), (7800.0, 8400.0)].
+    # Either end may be left out ("-10:00", "1:00:00-") to mean the start/end of the video.
+    ranges = []
+    for item in text.replace(";", ",").split(","):
+        if not item.strip():
+            continue
+        start, separator, end = item.partition("-")
+        if not separator:
+            raise ValueError(f"Invalid time range '{item.strip()}', expected start-end (e.g. 1:00:00-1:30:00).")
+        try:
+            start = parse_timestamp(start) if start.strip() else 0.0
+            end = parse_timestamp(end) if end.strip() else math.inf
+        except ValueError:
+            raise ValueError(f"Invalid time range '{item.strip()}', expected start-end (e.g. 1:00:00-1:30:00).")
+        if end <= start:
+            raise ValueError(f"Invalid time range '{item.strip()}': the end must be after the start.")
+        ranges.append((start, end))
+    return ranges
+
+
+def select_time_ranges(segments, ranges):
+    # Keeps the segments that overlap any of the ranges, in video order
+    return [item for item in segments
+            if any(item['start'] < end and item['start'] + item['duration'] > start for start, end in ranges)]
+
+
+class SegmentStore:
+    # Caption segments as a struct of arrays: one text buffer holding every segment
+    # joined by a single space, the offset where each segment starts in it, and the
+    # start/duration of each segment. ~24 bytes per segment instead of one dict each.
+    def __init__(self, text, offsets, starts, durations):
+        self.text = text
+        self.offsets = offsets
+        self.starts = starts
+        self.durations = durations
+
+    @classmethod
+    def from_segments(cls, segments):
+        parts = []
+        offsets = array('q')
+        starts = array('d')
+        durations = array('d')
+        position = 0
+        for item in segments:
+            parts.append(item['text'])
+            offsets.append(position)
+            starts.append(item['start'])
+            durations.append(item['duration'])
+            position += len(item['text']) + 1
+        # Normalising whitespace keeps every length, so the offsets stay valid
+        return cls(normalize_whitespace(" ".join(parts)), offsets, starts, durations)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def segment_text(self, index):
+        end = self.offsets[index + 1] - 1 if index + 1 < len(self.offsets) else len(self.text)
+        return self.text[self.offsets[index]:end]
+
+    def iter_segments(self):
+        for index in range(len(self.offsets)):
+            yield {"text": self.segment_text(index), "start": self.starts[index], "duration": self.durations[index]}
+
+    def segment_at(self, offset):
+        # Index of the segment containing a character offset, by binary search
+        return max(0, bisect_right(self.offsets, offset) - 1)
+
+    def time_at(self, offset):
+        return self.starts[self.segment_at(offset)]
+
+    def pause_offsets(self, min_gap=1.0):
+        # Offsets of the separators between segments that are at least `min_gap` seconds apart
+        pauses = []
+        for index in range(1, len(self.offsets)):
+            if self.starts[index] - (self.starts[index - 1] + self.durations[index - 1]) >= min_gap:
+                pauses.append(self.offsets[index] - 1)
+        return pauses
+
+    def time_range(self, start, end):
+        # Video time covered by text[start:end]: from the start of its first segment
+        # to the end of its last one
+        if not self.offsets:
+            return 0.0, 0.0
+        first = self.segment_at(start)
+        last = self.segment_at(max(start, end - 1))
+        return self.starts[first], self.starts[last] + self.durations[last]
@@ -0,0 +1,100 @@
+import base64
+import os
+import re
+
+
+# Pre-tokenisation for the offline estimate: BPE merges never cross these pieces, so a
+# text's token count is the sum of its pieces' counts and each distinct piece is counted once.
+PRETOKENIZE_RE = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+")
+
+# The split patterns of the tiktoken encodings, written for the re module: it has no
+# \p{L}/\p{N}, so letters are [^\W\d_] and numbers \d. The pieces are the same as
+# tiktoken's except around non-decimal numerals such as "²", "½" or "Ⅻ".
+CL100K_SPLIT_RE = re.compile(r"'(?i:[sdmt]|ll|ve|re)|(?:[^\r\n\w]|_)?[^\W\d_]+|\d{1,3}| ?(?:[^\s\w]|_)+[\r\n]*|\s+\Z|\s*[\r\n]|\s+(?!\S)|\s")
+R50K_SPLIT_RE = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d+| ?(?:[^\s\w]|_)+|\s+\Z|\s+(?!\S)|\s")
+SPLIT_PATTERNS = {"cl100k_base": CL100K_SPLIT_RE, "r50k_base": R50K_SPLIT_RE, "p50k_base": R50K_SPLIT_RE, "gpt2": R50K_SPLIT_RE}
+
+
+class HeuristicTokenizer:
+    # Offline estimate with no vocabulary: about 4 ASCII characters per token,
+    # 2 per token for other alphabets (accents, Cyrillic, Greek...) and one token
+    # per CJK character.
+    def __init__(self):
+        self.cache = {}
+
+    def count(self, text):
+        return sum(self.count_piece(piece) for piece in PRETOKENIZE_RE.findall(text))
+
+    def count_piece(self, piece):
+        tokens = self.cache.get(piece)
+        if tokens is None:
+            ascii_chars = wide_chars = other_chars = 0
+            for char in piece:
+                if char < "\x80":
+                    ascii_chars += 1
+                elif char >= "\u2e80":
+                    wide_chars += 1
+                else:
+                    other_chars += 1
+            tokens = max(1, -(-ascii_chars // 4) + -(-other_chars // 2) + wide_chars)
+            if len(self.cache) > 100000:
+                self.cache.clear()
+            self.cache[piece] = tokens
+        return tokens
+
+
+class BPETokenizer:
+    # Byte-level BPE counting from a local ranks file in the tiktoken format
+    # (one "<base64 token> <rank>" per line, e.g. cl100k_base.tiktoken). The split pattern
+    # is picked from the file name; counts are exact for the encodings in SPLIT_PATTERNS
+    # and only approximate for other vocabularies, which get the cl100k_base pattern.
+    def __init__(self, ranks, pattern=CL100K_SPLIT_RE):
+        self.ranks = ranks
+        self.pattern = pattern
+        self.cache = {}
+
+    @classmethod
+    def from_file(cls, path):
+        ranks = {}
+        with open(path, 'rb') as file:
+            for line in file:
+                if line.strip():
+                    token, rank = line.split()
+                    ranks[base64.b64decode(token)] = int(rank)
+        name = os.path.basename(path).split(".")[0]
+        return cls(ranks, SPLIT_PATTERNS.get(name, CL100K_SPLIT_RE))
+
+    def count(self, text):
+        return sum(self.count_piece(piece) for piece in self.pattern.findall(text))
+
+    def count_piece(self, piece):
+        tokens = self.cache.get(piece)
+        if tokens is None:
+            tokens = len(self.merge(piece.encode("utf-8")))
+            if len(self.cache) > 100000:
+                self.cache.clear()
+            self.cache[piece] = tokens
+        return tokens
+
+    def merge(self, data):
+        if data in self.ranks:
+            return [data]
+        parts = [data[i:i + 1] for i in range(len(data))]
+        # Repeatedly merge the adjacent pair with the lowest rank, as the encoder does
+        while len(parts) > 1:
+            best_rank = best_index = None
+            for i in range(len(parts) - 1):
+                rank = self.ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank, best_index = rank, i
+            if best_index is None:
+                break
+            parts[best_index:best_index + 2] = [parts[best_index] + parts[best_index + 1]]
+        return parts
+
+
+def load_tokenizer(path=None):
+    # Any object with a count(text) method can be used as a tokenizer
+    if path:
+        return BPETokenizer.from_file(path)
+    return HeuristicTokenizer()
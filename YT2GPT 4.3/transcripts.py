@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import re
+from urllib.parse import urlparse, parse_qs
+
+
+VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+class TranscriptUnavailable(Exception):
+    pass
+
+
+def extract_video_id(video_link):
+    link = video_link.strip()
+    if VIDEO_ID_RE.match(link):
+        return link
+    parsed = urlparse(link if "://" in link else "https://" + link)
+    host = parsed.netloc.lower()
+    path_parts = [part for part in parsed.path.split("/") if part]
+    if host.endswith("youtu.be") and path_parts:
+        return path_parts[0]
+    query = parse_qs(parsed.query)
+    if "v" in query:
+        return query["v"][0]
+    if len(path_parts) >= 2 and path_parts[0] in ("shorts", "embed", "live", "v"):
+        return path_parts[1]
+    # Fall back to the historic behaviour for anything we don't recognise
+    if "&list=" in link:
+        link = link.split("&list=")[0]
+    return link.split("=")[-1]
+
+
+class TranscriptSource:
+    # A source maps a video ID to (track, segments), where track is
+    # {"kind": "manual"|"generated", "language_code": ...} and segments are
+    # {"text", "start", "duration"} dicts. Missing transcripts raise TranscriptUnavailable.
+    cacheable = False
+
+    def fetch(self, video_id):
+        raise NotImplementedError
+
+
+class YouTubeSource(TranscriptSource):
+    cacheable = True
+
+    def fetch(self, video_id):
+        # Imported here so the offline sources work without the YouTube client installed
+        from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+        try:
+            transcripts = list(YouTubeTranscriptApi.list_transcripts(video_id))
+            # Prefer a manually created transcript, otherwise take the first generated one
+            manual = [transcript for transcript in transcripts if not transcript.is_generated]
+            generated = [transcript for transcript in transcripts if transcript.is_generated]
+            if not manual and not generated:
+                raise TranscriptUnavailable(f"No transcript is available for video {video_id}")
+            transcript = (manual or generated)[0]
+            transcript_data = transcript.fetch()
+        except (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable) as e:
+            raise TranscriptUnavailable(str(e)) from e
+        track = {
+            "kind": "generated" if transcript.is_generated else "manual",
+            "language_code": transcript.language_code,
+        }
+        segments = [{"text": item["text"], "start": item["start"], "duration": item["duration"]} for item in transcript_data]
+        return track, segments
+
+
+class ReplaySource(TranscriptSource):
+    # Serves <directory>/<video_id>.json, holding either a segment list or
+    # {"track": ..., "segments": [...]} as written by save().
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, video_id):
+        return os.path.join(self.directory, video_id + ".json")
+
+    def fetch(self, video_id):
+        try:
+            with open(self.path(video_id), 'r') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            raise TranscriptUnavailable(f"No replay file for video {video_id} in {self.directory}")
+        if isinstance(data, list):
+            return {"kind": "manual", "language_code": "en"}, data
+        return data.get("track", {"kind": "manual", "language_code": "en"}), data["segments"]
+
+    def save(self, video_id, track, segments):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(video_id), 'w') as file:
+            json.dump({"track": track, "segments": segments}, file)
+
+
+class SyntheticSource(TranscriptSource):
+    # Generates a deterministic transcript of the requested length for any video ID,
+    # for profiling and load tests without network access.
+    WORDS = (
+        "the of and to in we that this is it you for on with data model energy heat system "
+        "result value design flow rate pressure number results example first second next point "
+        "important really question answer because which would could about there their time"
+    ).split()
+
+    def __init__(self, hours=1.0, words_per_minute=150, segment_duration=3.0, seed=0):
+        self.hours = hours
+        self.words_per_minute = words_per_minute
+        self.segment_duration = segment_duration
+        self.seed = seed
+
+    def fetch(self, video_id):
+        rng = random.Random(f"{self.seed}:{video_id}")
+        words_per_segment = max(1, round(self.words_per_minute * self.segment_duration / 60))
+        count = int(self.hours * 3600 / self.segment_duration)
+        segments = []
+        for i in range(count):
+            words = rng.choices(self.WORDS, k=words_per_segment)
+            text = " ".join(words)
+            if rng.random() < 0.3:
+                text += rng.choice(".?!")
+            segments.append({"text": text, "start": i * self.segment_duration, "duration": self.segment_duration})
+        return {"kind": "generated", "language_code": "en"}, segments
+
+
+def source_from_spec(spec):
+    # "youtube" (default), "replay:<directory>" or "synthetic[:<hours>]"
+    name, _, argument = (spec or "youtube").partition(":")
+    if name == "youtube":
+        return YouTubeSource()
+    if name == "replay":
+        return ReplaySource(argument or "replay")
+    if name == "synthetic":
+        return SyntheticSource(hours=float(argument or 1))
+    raise ValueError(f"Unknown transcript source: {spec}")
+
+
+def load_transcript(video_id, cache=None, source=None):
+    # Returns (track, segments), going to the source only on a cache miss
+    if source is None:
+        source = YouTubeSource()
+    if not source.cacheable:
+        cache = None
+    if cache is not None:
+        cached = cache.lookup(video_id)
+        if cached is not None:
+            return cached
+    try:
+        track, segments = source.fetch(video_id)
+    except TranscriptUnavailable as e:
+        if cache is not None:
+            cache.store_unavailable(video_id, str(e))
+        raise
+    if cache is not None:
+        cache.store(video_id, track, segments)
+    return track, segments
+